@@ -48,9 +48,6 @@ disp = ST7735.ST7735(
 # Initialize display.
 disp.begin()
 
-width = disp.width
-height = disp.height
-
 # Load an image.
 print('Loading gif: {}...'.format(image_file))
 image = Image.open(image_file)
@@ -62,7 +59,7 @@ frame = 0
 while True:
     try:
         image.seek(frame)
-        disp.display(image.resize((width, height)))
+        disp.display(image, scale='stretch')
         frame += 1
         time.sleep(0.05)
 
@@ -46,9 +46,6 @@ disp = ST7735.ST7735(
     spi_speed_hz=4000000
 )
 
-WIDTH = disp.width
-HEIGHT = disp.height
-
 # Initialize display.
 disp.begin()
 
@@ -56,10 +53,7 @@ disp.begin()
 print('Loading image: {}...'.format(image_file))
 image = Image.open(image_file)
 
-# Resize the image
-image = image.resize((WIDTH, HEIGHT))
-
-# Draw the image on the display hardware.
+# Draw the image on the display hardware, stretched to fill the screen.
 print('Drawing image')
 
-disp.display(image)
+disp.display(image, scale='stretch', draft=True)
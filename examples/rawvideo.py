@@ -0,0 +1,44 @@
+from __future__ import print_function
+
+import io
+import sys
+
+import ST7735
+from ST7735.stream import RawVideoStream
+
+print("""
+rawvideo.py - Show raw video frames piped from stdin or read from a FIFO.
+
+Frames must be 160x80 pixels, eg:
+
+ffmpeg -i video.mp4 -vf scale=160:80 -f rawvideo -pix_fmt rgb565be - | python3 rawvideo.py
+
+Usage: {} [RGB565|RGB565LE|RGB24] [block|latest] [fifo]
+
+If you're using Breakout Garden, plug the 0.96" LCD (SPI)
+breakout into the front slot.
+""".format(sys.argv[0]), file=sys.stderr)
+
+pixel_format = sys.argv[1] if len(sys.argv) > 1 else 'RGB565'
+backpressure = sys.argv[2] if len(sys.argv) > 2 else 'latest'
+
+if len(sys.argv) > 3:
+    stream = io.open(sys.argv[3], 'rb')
+else:
+    # A binary stream over stdin, on both Python 2 and 3
+    stream = io.open(sys.stdin.fileno(), 'rb', closefd=False)
+
+# Create ST7735 LCD display class.
+disp = ST7735.ST7735(
+    port=0,
+    cs=ST7735.BG_SPI_CS_FRONT,  # BG_SPI_CSB_BACK or BG_SPI_CS_FRONT
+    dc=9,
+    backlight=19,               # 18 for back BG slot, 19 for front BG slot.
+    rotation=90,
+    spi_speed_hz=10000000
+)
+
+video = RawVideoStream(disp, stream, pixel_format=pixel_format, backpressure=backpressure)
+video.play()
+
+print("Dropped {} frames".format(video.dropped), file=sys.stderr)
@@ -1,9 +1,10 @@
 from PIL import Image
-from PIL import ImageDraw
 from PIL import ImageFont
+import numpy as np
 import time
 
 import ST7735
+from ST7735.text import TextRenderer
 
 
 MESSAGE = "Hello World! How are you today?"
@@ -24,23 +25,24 @@ disp.begin()
 WIDTH = disp.width
 HEIGHT = disp.height
 
+font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 30)
 
-img = Image.new('RGB', (WIDTH, HEIGHT), color=(0, 0, 0))
-
-draw = ImageDraw.Draw(img)
+# Glyphs are rendered once, then strings are composed from the cached atlas
+text = TextRenderer(disp, font, fill=(255, 255, 255), background=(0, 0, 0))
 
-font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 30)
+size_x = text.atlas.text_width(MESSAGE)
+text_y = (HEIGHT - text.height) // 2
 
-size_x, size_y = draw.textsize(MESSAGE, font)
+# Clear the screen once, afterwards only the text's rows are redrawn
+disp.display(Image.new('RGB', (WIDTH, HEIGHT), color=(0, 0, 0)))
 
-text_x = 160
-text_y = (80 - size_y) // 2
+# Pad the message with a screen's width of background either side, so
+# scrolling is just a matter of sending a different slice of the strip
+blank = text.atlas.render("", width=WIDTH)
+strip = np.hstack((blank, text.atlas.render(MESSAGE), blank))
 
 t_start = time.time()
 
 while True:
-    x = (time.time() - t_start) * 100
-    x %= (size_x + 160)
-    draw.rectangle((0, 0, 160, 80), (0, 0, 0))
-    draw.text((int(text_x - x), text_y), MESSAGE, font=font, fill=(255, 255, 255))
-    disp.display(img)
+    x = int((time.time() - t_start) * 100) % (size_x + WIDTH)
+    disp.display_region(strip[:, x:x + WIDTH], 0, text_y)
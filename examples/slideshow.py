@@ -0,0 +1,36 @@
+import sys
+
+import ST7735
+from ST7735.pipeline import FramePipeline, image_frames
+
+print("""
+slideshow.py - Play images and GIFs, preparing frames on every CPU core.
+
+If you're using Breakout Garden, plug the 0.96" LCD (SPI)
+breakout into the front slot.
+""")
+
+if len(sys.argv) < 2:
+    print("Usage: {} <image_file> [image_file...]".format(sys.argv[0]))
+    sys.exit(1)
+
+# Create ST7735 LCD display class.
+disp = ST7735.ST7735(
+    port=0,
+    cs=ST7735.BG_SPI_CS_FRONT,  # BG_SPI_CSB_BACK or BG_SPI_CS_FRONT
+    dc=9,
+    backlight=19,               # 18 for back BG slot, 19 for front BG slot.
+    rotation=90,
+    spi_speed_hz=10000000
+)
+
+# Every frame of every file, in order
+sources = []
+for image_file in sys.argv[1:]:
+    sources += image_frames(image_file)
+
+print('Playing {} frames, press Ctrl+C to exit!'.format(len(sources)))
+
+with FramePipeline(disp) as pipeline:
+    while True:
+        pipeline.play(sources, fps=20)
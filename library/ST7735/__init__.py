@@ -18,12 +18,22 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
+import collections
+import functools
 import numbers
+import struct
+import threading
 import time
 import numpy as np
 
-import spidev
-import RPi.GPIO as GPIO
+try:
+    import spidev
+    import RPi.GPIO as GPIO
+    _hardware_error = None
+except ImportError as e:
+    # Only the display driver needs these, so offline tools like trace analysis still import
+    spidev = GPIO = None
+    _hardware_error = e
 
 
 __version__ = '0.0.4'
@@ -98,6 +108,54 @@ ST7735_MAGENTA = 0xF81F  # 0b 11111 000000 11111
 ST7735_YELLOW = 0xFFE0  # 0b 11111 111111 00000
 ST7735_WHITE = 0xFFFF  # 0b 11111 111111 11111
 
+# Frame rate and power control part of each panel's init sequence,
+# as (command, parameters, delay in seconds) entries
+_INIT_MINI = (
+    (ST7735_FRMCTR1, (0x01, 0x2C, 0x2D), 0),                    # Frame rate ctrl - normal mode, rate = fosc/(1x2+40) * (LINE+2C+2D)
+    (ST7735_FRMCTR2, (0x01, 0x2C, 0x2D), 0),                    # Frame rate ctrl - idle mode
+    (ST7735_FRMCTR3, (0x01, 0x2C, 0x2D, 0x01, 0x2C, 0x2D), 0),  # Frame rate ctrl - partial mode, dot then line inversion
+    (ST7735_INVCTR, (0x07,), 0),                                # Display inversion ctrl, no inversion
+    (ST7735_PWCTR1, (0xA2, 0x02, 0x84), 0),                     # Power control, -4.6V, auto mode
+    (ST7735_PWCTR2, (0x0A, 0x00), 0),                           # Power control, opamp current small, boost frequency
+    (ST7735_PWCTR4, (0x8A, 0x2A), 0),                           # Power control, BCLK/2, opamp current small & medium low
+    (ST7735_PWCTR5, (0x8A, 0xEE), 0),                           # Power control
+    (ST7735_VMCTR1, (0x0E,), 0),                                # Power control
+)
+
+_INIT_TAB = (
+    (ST7735_FRMCTR1, (0x01, 0x2C, 0x2D), 0),                    # Frame rate ctrl - normal mode
+    (ST7735_FRMCTR2, (0x01, 0x2C, 0x2D), 0),                    # Frame rate ctrl - idle mode
+    (ST7735_FRMCTR3, (0x01, 0x2C, 0x2D, 0x01, 0x2C, 0x2D), 0),  # Frame rate ctrl - partial mode
+    (ST7735_INVCTR, (0x07,), 0),                                # Display inversion ctrl, no inversion
+    (ST7735_PWCTR1, (0xA2, 0x02, 0x84), 0),                     # Power control, -4.6V, auto mode
+    (ST7735_PWCTR2, (0xC5,), 0),                                # Power control, VGH25 = 2.4C VGSEL = -10 VGH = 3 * AVDD
+    (ST7735_PWCTR3, (0x0A, 0x00), 0),                           # Power control, opamp current small, boost frequency
+    (ST7735_PWCTR4, (0x8A, 0x2A), 0),                           # Power control, BCLK/2, opamp current small & medium low
+    (ST7735_PWCTR5, (0x8A, 0xEE), 0),                           # Power control
+    (ST7735_VMCTR1, (0x0E,), 0),                                # Power control
+)
+
+_INIT_GAMMA = (
+    (ST7735_GMCTRP1, (0x02, 0x1c, 0x07, 0x12, 0x37, 0x32, 0x29, 0x2d,
+                      0x29, 0x25, 0x2B, 0x39, 0x00, 0x01, 0x03, 0x10), 0),  # Set Gamma
+    (ST7735_GMCTRN1, (0x03, 0x1d, 0x07, 0x06, 0x2E, 0x2C, 0x29, 0x2D,
+                      0x2E, 0x2E, 0x37, 0x3F, 0x00, 0x00, 0x02, 0x10), 0),  # Set Gamma
+)
+
+# Geometry and init settings for a panel. Offsets of None centre the panel in display RAM,
+# madctl is the memory access control byte and init the frame rate and power control sequence.
+PanelProfile = collections.namedtuple('PanelProfile', ('width', 'height', 'offset_left', 'offset_top', 'invert', 'rotation', 'madctl', 'init'))
+
+PROFILES = {
+    '0.96-80x160': PanelProfile(80, 160, None, None, True, 90, 0xC8, _INIT_MINI),
+    '1.8-128x160-red': PanelProfile(128, 160, 0, 0, False, 0, 0xC8, _INIT_TAB),
+    '1.8-128x160-green': PanelProfile(128, 160, 2, 1, False, 0, 0xC8, _INIT_TAB),
+    '1.8-128x160-black': PanelProfile(128, 160, 0, 0, False, 0, 0xC0, _INIT_TAB),
+    '1.44-128x128': PanelProfile(128, 128, 2, 3, False, 0, 0xC8, _INIT_TAB),
+}
+
+DEFAULT_PROFILE = '0.96-80x160'
+
 
 def color565(r, g, b):
     """Convert red, green, blue components to a 16-bit 565 RGB value. Components
@@ -106,26 +164,243 @@ def color565(r, g, b):
     return ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
 
 
-def image_to_data(image, rotation=0):
-    """Generator function to convert a PIL image to 16-bit 565 RGB bytes."""
+def color_correction_lut(gamma=1.0, brightness=1.0, white_balance=(1.0, 1.0, 1.0)):
+    """Build per-channel lookup tables that colour correct and pack 8-bit RGB into 565 RGB.
+
+    Returns three 256 entry tables, for red, green and blue, holding each corrected
+    level already shifted into its 565 bit field, so a pixel is ``r[R] | g[G] | b[B]``.
+
+    :param gamma: Gamma exponent applied to each channel, 1.0 for none
+    :param brightness: Scale applied to all channels, 0.0 to 1.0 to dim
+    :param white_balance: (r, g, b) scale applied to each channel
+
+    """
+    levels = np.arange(256) / 255.0
+    r, g, b = (np.clip(np.round(255 * levels ** gamma * brightness * balance), 0, 255).astype('uint16') for balance in white_balance)
+    return ((r & 0xF8) << 8), ((g & 0xFC) << 3), (b >> 3)
+
+
+def image_to_rgb565(image, rotation=0, lut=None):
+    """Convert a PIL image to a NumPy array of 16-bit 565 RGB values.
+
+    The array is rotated into display RAM order, so ``.astype('>u2').tobytes()``
+    gives bytes that can be written straight to the display.
+
+    :param lut: Optional colour correction tables from `color_correction_lut`
+    """
     # NumPy is much faster at doing this. NumPy code provided by:
     # Keith (https://www.blogger.com/profile/02555547344016007163)
-    pb = np.rot90(np.array(image.convert('RGB')), rotation // 90).astype('uint16')
-    color = ((pb[:, :, 0] & 0xF8) << 8) | ((pb[:, :, 1] & 0xFC) << 3) | (pb[:, :, 2] >> 3)
+    return _pack565(np.rot90(np.array(image.convert('RGB')), rotation // 90), lut)
+
+
+def _pack565(pb, lut=None):
+    """Pack an (..., 3) array of 8-bit RGB values into 16-bit 565 RGB values."""
+    if lut is None:
+        pb = pb.astype('uint16')
+    return _pack565_channels(pb[..., 0], pb[..., 1], pb[..., 2], lut)
+
+
+def _pack565_channels(r, g, b, lut=None):
+    """Pack 8-bit red, green and blue arrays into 16-bit 565 RGB values, through colour correction tables if given."""
+    if lut is not None:
+        return lut[0][r] | lut[1][g] | lut[2][b]
+    return ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
+
+
+def _frombuffer(data, dtype):
+    """Return a NumPy array viewing a bytes-like object, including a memoryview on Python 2."""
+    if isinstance(data, memoryview):
+        # Python 2's memoryview lacks the old buffer interface np.frombuffer uses
+        data = np.asarray(data)
+    return np.frombuffer(data, dtype=dtype)
+
+
+def image_to_data(image, rotation=0, lut=None):
+    """Generator function to convert a PIL image to 16-bit 565 RGB bytes.
+
+    :param lut: Optional colour correction tables from `color_correction_lut`, applied in the same pass
+    """
+    color = image_to_rgb565(image, rotation, lut)
     return np.dstack(((color >> 8) & 0xFF, color & 0xFF)).flatten().tolist()
 
 
+def palette_to_lut(palette, color_lut=None):
+    """Convert a palette to a 256 entry lookup table of big-endian 16-bit 565 RGB values.
+
+    `ST7735.display` sends indexes through the table as it is, so a table for a
+    colour corrected display must be built with the matching color_lut.
+
+    :param palette: Flat list of r, g, b values as returned by PIL's Image.getpalette(), or a list of (r, g, b) tuples
+    :param color_lut: Optional colour correction tables from `color_correction_lut`
+
+    """
+    colours = np.asarray(palette, dtype=np.uint8).reshape(-1, 3)[:256]
+    pb = np.zeros((256, 3), dtype=np.uint8)
+    pb[:len(colours)] = colours
+    return _pack565(pb, color_lut).astype('>u2')
+
+
+# Source pixel indexes and 8-bit fixed-point weights for each display RAM pixel,
+# plus a mask of the letterbox border left uncovered by "fit" scaling
+_Resample = collections.namedtuple('_Resample', ('indexes', 'weights', 'border'))
+
+SCALE_MODES = ('fit', 'fill', 'stretch')
+RESAMPLE_MODES = ('nearest', 'bilinear')
+
+
+def _resample_axis(src, dst, scale, offset, resample):
+    """Return source indexes (and weights for bilinear) along one axis, plus a mask of pixels outside the source."""
+    # Source coordinate of each destination pixel centre
+    u = (np.arange(dst) + 0.5) * scale + offset - 0.5
+    outside = (u < -0.5) | (u >= src - 0.5)
+    if resample == 'nearest':
+        return (np.clip(np.floor(u + 0.5), 0, src - 1).astype(np.intp),), None, outside
+    u0 = np.floor(u)
+    weight = np.round((u - u0) * 256).astype(np.uint16)
+    u0 = u0.astype(np.intp)
+    return (np.clip(u0, 0, src - 1), np.clip(u0 + 1, 0, src - 1)), (256 - weight, weight), outside
+
+
+def _resample_map(size, display_size, rotation, scale, resample):
+    """Build a map from display RAM pixels to source pixels for scaling an image to the display."""
+    if scale not in SCALE_MODES:
+        raise ValueError("Unsupported scale mode: {}".format(scale))
+    if resample not in RESAMPLE_MODES:
+        raise ValueError("Unsupported resample mode: {}".format(resample))
+
+    (sw, sh), (dw, dh) = size, display_size
+    if scale == 'stretch':
+        sx, sy = float(sw) / dw, float(sh) / dh
+    else:
+        choose = min if scale == 'fit' else max
+        sx = sy = 1.0 / choose(float(dw) / sw, float(dh) / sh)
+
+    # Centre the scaled image on the display
+    xs, xw, xout = _resample_axis(sw, dw, sx, (sw - dw * sx) / 2, resample)
+    ys, yw, yout = _resample_axis(sh, dh, sy, (sh - dh * sy) / 2, resample)
+
+    k = rotation // 90
+    indexes = tuple(np.ascontiguousarray(np.rot90(y[:, None] * sw + x[None, :], k)) for y in ys for x in xs)
+
+    weights = None
+    if resample == 'bilinear':
+        weights = []
+        for y in yw:
+            # Round the left weight and give the right the remainder, so all four always sum to 256
+            row = np.repeat(y[:, None].astype(np.uint32), len(xw[0]), axis=1)
+            left = (row * xw[0][None, :] + 128) >> 8
+            weights += [left, row - left]
+        weights = tuple(np.ascontiguousarray(np.rot90(w, k)).astype(np.uint16)[..., None] for w in weights)
+
+    border = yout[:, None] | xout[None, :]
+    border = np.rot90(border, k) if border.any() else None
+
+    return _Resample(indexes, weights, border)
+
+
+YUV_FORMATS = ('YUV420', 'NV12')
+
+
+def _yuv_map(size, stride, pixel_format, display_size, rotation, scale):
+    """Build Y, U and V byte offsets into a planar YUV frame for each display RAM pixel."""
+    if pixel_format not in YUV_FORMATS:
+        raise ValueError("Unsupported YUV format: {}".format(pixel_format))
+
+    width, height = size
+    resample_map = _resample_map(size, display_size, rotation, scale, 'nearest')
+    y, x = np.divmod(resample_map.indexes[0], width)
+
+    luma = y * stride + x
+    chroma = stride * height
+    if pixel_format == 'YUV420':
+        # Separate quarter-size U and V planes
+        u = chroma + (y // 2) * (stride // 2) + x // 2
+        v = u + (stride // 2) * (height // 2)
+    else:
+        # One quarter-size plane of interleaved U, V pairs
+        u = chroma + (y // 2) * stride + (x // 2) * 2
+        v = u + 1
+
+    return _Resample((luma, u, v), None, resample_map.border)
+
+
+def _wakes(method):
+    """Wake a sleeping display before drawing, and count drawing as activity for the idle timeout."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            if self._sleeping:
+                self.wake()
+            result = method(self, *args, **kwargs)
+            self._last_activity = time.time()
+        return result
+    return wrapper
+
+
+class Sprite(object):
+    """Pre-converted 16-bit 565 RGB pixels, with an optional mask, for `ST7735.blit`."""
+
+    def __init__(self, pixels, mask=None):
+        """Create a sprite.
+
+        :param pixels: NumPy array of 16-bit 565 RGB values with shape (height, width)
+        :param mask: Optional boolean NumPy array of the same shape, True where the sprite is opaque
+
+        """
+        self.pixels = pixels
+        self.mask = mask
+        self._rgb = None
+        self._lut = None
+
+    @classmethod
+    def from_image(cls, image, lut=None):
+        """Create a sprite from a PIL image, masked by its alpha channel if it has one.
+
+        The image's colours are kept, so `ST7735.blit` can convert them again
+        when the display's colour correction differs from lut.
+
+        :param lut: Optional colour correction tables from `color_correction_lut`
+
+        """
+        mask = None
+        if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+            image = image.convert('RGBA')
+            mask = np.array(image)[:, :, 3] >= 128
+        rgb = np.array(image.convert('RGB'))
+        sprite = cls(_pack565(rgb, lut), mask)
+        sprite._rgb = rgb
+        sprite._lut = lut
+        return sprite
+
+    def _correct(self, lut):
+        """Convert the pixels again with lut, if the sprite came from an image converted with other tables."""
+        if self._rgb is not None and lut is not self._lut:
+            self.pixels = _pack565(self._rgb, lut)
+            self._lut = lut
+
+    @property
+    def width(self):
+        return self.pixels.shape[1]
+
+    @property
+    def height(self):
+        return self.pixels.shape[0]
+
+
 class ST7735(object):
     """Representation of an ST7735 TFT LCD."""
 
-    def __init__(self, port, cs, dc, backlight=None, rst=None, width=ST7735_TFTWIDTH,
-                 height=ST7735_TFTHEIGHT, rotation=90, offset_left=None, offset_top=None, invert=True, spi_speed_hz=4000000):
+    def __init__(self, port, cs, dc, backlight=None, rst=None, width=None,
+                 height=None, rotation=None, offset_left=None, offset_top=None, invert=None, spi_speed_hz=4000000, profile=DEFAULT_PROFILE):
         """Create an instance of the display using SPI communication.
 
         Must provide the GPIO pin number for the D/C pin and the SPI driver.
 
         Can optionally provide the GPIO pin number for the reset pin as the rst parameter.
 
+        Panel geometry and init sequence come from a profile, see PROFILES. Any of
+        width, height, rotation, offset_left, offset_top and invert override it.
+
         :param port: SPI port number
         :param cs: SPI chip-select number (0 or 1 for BCM
         :param backlight: Pin for controlling backlight
@@ -137,8 +412,23 @@ class ST7735(object):
         :param offset_top: ROW offset in ST7735 memory
         :param invert: Invert display
         :param spi_speed_hz: SPI speed (in Hz)
+        :param profile: Name of a panel in PROFILES, or a PanelProfile
 
         """
+        if _hardware_error is not None:
+            raise _hardware_error
+
+        if not isinstance(profile, PanelProfile):
+            if profile not in PROFILES:
+                raise ValueError("Unknown panel profile: {}, expected one of: {}".format(profile, ", ".join(sorted(PROFILES))))
+            profile = PROFILES[profile]
+
+        width = profile.width if width is None else width
+        height = profile.height if height is None else height
+        rotation = profile.rotation if rotation is None else rotation
+        invert = profile.invert if invert is None else invert
+        offset_left = profile.offset_left if offset_left is None else offset_left
+        offset_top = profile.offset_top if offset_top is None else offset_top
 
         GPIO.setwarnings(False)
         GPIO.setmode(GPIO.BCM)
@@ -154,6 +444,22 @@ class ST7735(object):
         self._height = height
         self._rotation = rotation
         self._invert = invert
+        self._background = None
+        self._trace = None
+        self._color_lut = None
+        self._lock = threading.RLock()
+        self._idle = threading.Condition(self._lock)
+        self._idle_timeout = None
+        self._idle_thread = None
+        self._sleeping = False
+        self._sleep_time = 0
+        self._last_activity = time.time()
+        self._buffer = None
+        self._frame = None
+        self._palette = None
+        self._palette_lut = None
+        self._resample_maps = {}
+        self._sprites = collections.OrderedDict()
 
         # Default left offset to center display
         if offset_left is None:
@@ -167,11 +473,14 @@ class ST7735(object):
 
         self._offset_top = offset_top
 
+        self._compile(profile)
+
         # Set DC as output.
         GPIO.setup(dc, GPIO.OUT)
 
         # Setup backlight as output (if provided).
         self._backlight = backlight
+        self._backlight_value = GPIO.HIGH
         if backlight is not None:
             GPIO.setup(backlight, GPIO.OUT)
             GPIO.output(backlight, GPIO.LOW)
@@ -191,15 +500,140 @@ class ST7735(object):
         data (False).  Chunk_size is an optional size of bytes to write in a
         single SPI transaction, with a default of 4096.
         """
+        if self._trace is not None:
+            start = time.time()
         # Set DC low for command, high for data.
         GPIO.output(self._dc, is_data)
         # Convert scalar argument to list so either can be passed as parameter.
         if isinstance(data, numbers.Number):
             data = [data & 0xFF]
-        self._spi.xfer3(data)
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            # Buffers go straight to the driver without a per-byte list copy
+            self._spi.writebytes2(data)
+        else:
+            self._spi.xfer3(data)
+        if self._trace is not None:
+            self._trace.record(is_data, data, start, time.time())
+
+    def start_trace(self, file, payload=True):
+        """Record everything sent to the display to a trace file.
+
+        See `ST7735.trace` for replaying and analysing traces.
+
+        :param file: Path or binary file object to write the trace to
+        :param payload: Record the data bytes sent as well as their sizes, needed to rebuild frames
+
+        """
+        from .trace import TraceWriter
+        self.stop_trace()
+        self._trace = TraceWriter(file, self, payload)
+
+    def stop_trace(self):
+        """Stop recording a trace started with `start_trace`."""
+        if self._trace is not None:
+            self._trace.close()
+            self._trace = None
+
+    def set_color_correction(self, gamma=1.0, brightness=1.0, white_balance=(1.0, 1.0, 1.0)):
+        """Set colour correction for everything displayed from RGB, palette or YUV sources.
+
+        Settings are compiled into lookup tables used by the 565 RGB conversion
+        itself, so correction adds no extra pass over each frame. Sprites made with
+        `Sprite.from_image`, text drawn by `text.TextRenderer` and compositor layers
+        follow the current correction, while a background cached by `set_background` keeps the
+        correction it was drawn with until it is set again. Lookup tables built
+        with `palette_to_lut` and passed to `display` are used as they are, so
+        build them with ``color_lut=color_correction_lut(...)`` and the same settings.
+
+        :param gamma: Gamma exponent applied to each channel, 1.0 for none
+        :param brightness: Scale applied to all channels, 0.0 to 1.0 to dim
+        :param white_balance: (r, g, b) scale applied to each channel, to match panel batches
+
+        """
+        if gamma == 1.0 and brightness == 1.0 and tuple(white_balance) == (1.0, 1.0, 1.0):
+            self._color_lut = None
+        else:
+            self._color_lut = color_correction_lut(gamma, brightness, white_balance)
+        # Cached palette tables were built with the old correction
+        self._palette = None
+
+    def sleep(self):
+        """Put the display to sleep, turning off the panel and backlight.
+
+        Display RAM and register settings are kept, so `wake` restores the
+        screen without a reset. Drawing wakes the display automatically.
+
+        """
+        with self._lock:
+            if self._sleeping:
+                return
+            self.command(ST7735_DISPOFF)    # Display off
+            self.command(ST7735_SLPIN)      # Sleep in
+            self._sleeping = True
+            self._sleep_time = time.time()
+            if self._backlight is not None:
+                GPIO.output(self._backlight, GPIO.LOW)
+
+    def wake(self):
+        """Wake the display from `sleep`, taking about 120ms.
+
+        The backlight is restored to its last `set_backlight` value.
+
+        """
+        with self._lock:
+            if not self._sleeping:
+                return
+            # Sleep out must follow sleep in by at least 120ms
+            delay = self._sleep_time + 0.120 - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            self.command(ST7735_SLPOUT)     # Out of sleep mode
+            time.sleep(0.120)               # delay 120 ms
+            self.command(ST7735_DISPON)     # Display on
+            self._sleeping = False
+            self._last_activity = time.time()
+            if self._backlight is not None:
+                GPIO.output(self._backlight, self._backlight_value)
+            self._idle.notify()
+
+    @property
+    def sleeping(self):
+        return self._sleeping
+
+    def set_idle_timeout(self, timeout):
+        """Put the display to sleep after timeout seconds without drawing.
+
+        :param timeout: Seconds of inactivity before sleeping, or None to disable
+
+        """
+        with self._lock:
+            self._idle_timeout = timeout
+            self._last_activity = time.time()
+            # The watcher exits when the timeout is cleared, so start a new one when it's set again
+            if timeout is not None and self._idle_thread is None:
+                self._idle_thread = threading.Thread(target=self._idle_watch)
+                self._idle_thread.daemon = True
+                self._idle_thread.start()
+            self._idle.notify()
+
+    def _idle_watch(self):
+        with self._lock:
+            while True:
+                if self._idle_timeout is None:
+                    self._idle_thread = None
+                    return
+                if self._sleeping:
+                    self._idle.wait()
+                    continue
+                remaining = self._last_activity + self._idle_timeout - time.time()
+                if remaining > 0:
+                    self._idle.wait(remaining)
+                    continue
+                self.sleep()
 
     def set_backlight(self, value):
         """Set the backlight on/off."""
+        self._backlight_value = value
         if self._backlight is not None:
             GPIO.output(self._backlight, value)
 
@@ -229,120 +663,41 @@ class ST7735(object):
             GPIO.output(self._rst, 1)
             time.sleep(0.500)
 
-    def _init(self):
-        # Initialize the display.
-
-        self.command(ST7735_SWRESET)    # Software reset
-        time.sleep(0.150)               # delay 150 ms
-
-        self.command(ST7735_SLPOUT)     # Out of sleep mode
-        time.sleep(0.500)               # delay 500 ms
-
-        self.command(ST7735_FRMCTR1)    # Frame rate ctrl - normal mode
-        self.data(0x01)                 # Rate = fosc/(1x2+40) * (LINE+2C+2D)
-        self.data(0x2C)
-        self.data(0x2D)
-
-        self.command(ST7735_FRMCTR2)    # Frame rate ctrl - idle mode
-        self.data(0x01)                 # Rate = fosc/(1x2+40) * (LINE+2C+2D)
-        self.data(0x2C)
-        self.data(0x2D)
-
-        self.command(ST7735_FRMCTR3)    # Frame rate ctrl - partial mode
-        self.data(0x01)                 # Dot inversion mode
-        self.data(0x2C)
-        self.data(0x2D)
-        self.data(0x01)                 # Line inversion mode
-        self.data(0x2C)
-        self.data(0x2D)
+    def _compile(self, profile):
+        """Pre-encode the init sequence and full screen window for a profile."""
+        self._window_params = (
+            struct.pack('>HH', self._offset_left, self._width + self._offset_left - 1),
+            struct.pack('>HH', self._offset_top, self._height + self._offset_top - 1)
+        )
+
+        sequence = [
+            (ST7735_SWRESET, (), 0.150),        # Software reset, delay 150 ms
+            (ST7735_SLPOUT, (), 0.500),         # Out of sleep mode, delay 500 ms
+        ]
+        sequence.extend(profile.init)
+        sequence.extend([
+            (ST7735_INVON if self._invert else ST7735_INVOFF, (), 0),
+            (ST7735_MADCTL, (profile.madctl,), 0),      # Memory access control (directions)
+            (ST7735_COLMOD, (0x05,), 0),                # 16-bit color
+            (ST7735_CASET, self._window_params[0], 0),  # Column addr set
+            (ST7735_RASET, self._window_params[1], 0),  # Row addr set
+        ])
+        sequence.extend(_INIT_GAMMA)
+        sequence.extend([
+            (ST7735_NORON, (), 0.100),          # Normal display on, delay 100 ms
+            (ST7735_DISPON, (), 0.100),         # Display on, delay 100 ms
+        ])
+
+        self._init_sequence = [(command, bytes(bytearray(params)), delay) for command, params, delay in sequence]
 
-        self.command(ST7735_INVCTR)     # Display inversion ctrl
-        self.data(0x07)                 # No inversion
-
-        self.command(ST7735_PWCTR1)     # Power control
-        self.data(0xA2)
-        self.data(0x02)                 # -4.6V
-        self.data(0x84)                 # auto mode
-
-        self.command(ST7735_PWCTR2)     # Power control
-        self.data(0x0A)                 # Opamp current small
-        self.data(0x00)                 # Boost frequency
-
-        self.command(ST7735_PWCTR4)     # Power control
-        self.data(0x8A)                 # BCLK/2, Opamp current small & Medium low
-        self.data(0x2A)
-
-        self.command(ST7735_PWCTR5)     # Power control
-        self.data(0x8A)
-        self.data(0xEE)
-
-        self.command(ST7735_VMCTR1)     # Power control
-        self.data(0x0E)
-
-        if self._invert:
-            self.command(ST7735_INVON)   # Invert display
-        else:
-            self.command(ST7735_INVOFF)  # Don't invert display
-
-        self.command(ST7735_MADCTL)     # Memory access control (directions)
-        self.data(0xC8)                 # row addr/col addr, bottom to top refresh
-
-        self.command(ST7735_COLMOD)     # set color mode
-        self.data(0x05)                 # 16-bit color
-
-        self.command(ST7735_CASET)      # Column addr set
-        self.data(0x00)                 # XSTART = 0
-        self.data(self._offset_left)
-        self.data(0x00)                 # XEND = ROWS - height
-        self.data(self._width + self._offset_left - 1)
-
-        self.command(ST7735_RASET)      # Row addr set
-        self.data(0x00)                 # XSTART = 0
-        self.data(self._offset_top)
-        self.data(0x00)                 # XEND = COLS - width
-        self.data(self._height + self._offset_top - 1)
-
-        self.command(ST7735_GMCTRP1)    # Set Gamma
-        self.data(0x02)
-        self.data(0x1c)
-        self.data(0x07)
-        self.data(0x12)
-        self.data(0x37)
-        self.data(0x32)
-        self.data(0x29)
-        self.data(0x2d)
-        self.data(0x29)
-        self.data(0x25)
-        self.data(0x2B)
-        self.data(0x39)
-        self.data(0x00)
-        self.data(0x01)
-        self.data(0x03)
-        self.data(0x10)
-
-        self.command(ST7735_GMCTRN1)    # Set Gamma
-        self.data(0x03)
-        self.data(0x1d)
-        self.data(0x07)
-        self.data(0x06)
-        self.data(0x2E)
-        self.data(0x2C)
-        self.data(0x29)
-        self.data(0x2D)
-        self.data(0x2E)
-        self.data(0x2E)
-        self.data(0x37)
-        self.data(0x3F)
-        self.data(0x00)
-        self.data(0x00)
-        self.data(0x02)
-        self.data(0x10)
-
-        self.command(ST7735_NORON)      # Normal display on
-        time.sleep(0.10)                # 10 ms
-
-        self.command(ST7735_DISPON)     # Display on
-        time.sleep(0.100)               # 100 ms
+    def _init(self):
+        # Initialize the display, sending each command's parameters in a single write.
+        for command, params, delay in self._init_sequence:
+            self.command(command)
+            if params:
+                self.data(params)
+            if delay:
+                time.sleep(delay)
 
     def begin(self):
         """Set up the display
@@ -359,42 +714,268 @@ class ST7735(object):
         are specified the default will be to update the entire display from 0,0
         to width-1,height-1.
         """
-        if x1 is None:
-            x1 = self._width - 1
-
-        if y1 is None:
-            y1 = self._height - 1
+        if x0 == 0 and y0 == 0 and x1 is None and y1 is None:
+            # Full screen window, encoded once by _compile
+            columns, rows = self._window_params
+        else:
+            if x1 is None:
+                x1 = self._width - 1
 
-        y0 += self._offset_top
-        y1 += self._offset_top
+            if y1 is None:
+                y1 = self._height - 1
 
-        x0 += self._offset_left
-        x1 += self._offset_left
+            columns = struct.pack('>HH', x0 + self._offset_left, x1 + self._offset_left)  # XSTART, XEND
+            rows = struct.pack('>HH', y0 + self._offset_top, y1 + self._offset_top)        # YSTART, YEND
 
         self.command(ST7735_CASET)       # Column addr set
-        self.data(x0 >> 8)
-        self.data(x0)                    # XSTART
-        self.data(x1 >> 8)
-        self.data(x1)                    # XEND
+        self.data(columns)
         self.command(ST7735_RASET)       # Row addr set
-        self.data(y0 >> 8)
-        self.data(y0)                    # YSTART
-        self.data(y1 >> 8)
-        self.data(y1)                    # YEND
+        self.data(rows)
         self.command(ST7735_RAMWR)       # write to RAM
 
-    def display(self, image):
+    @_wakes
+    def display(self, image, palette=None, scale=None, resample='nearest', draft=False):
         """Write the provided image to the hardware.
 
-        :param image: Should be RGB format and the same dimensions as the display hardware.
+        Palette ("P") mode images, and NumPy arrays of uint8 palette indexes, are
+        expanded through a 565 RGB lookup table that is only rebuilt when the palette changes.
+
+        With a scale mode, images of any size are scaled to the display through an
+        index map that is cached per source size, with rotation and 565 RGB conversion
+        done in the same gather. With draft, a JPEG that has not been loaded yet is
+        decoded at the smallest size that still covers the display.
+
+        :param image: Should be RGB or P format, or a uint8 NumPy array of palette indexes, and the same dimensions as the display hardware unless scaled.
+        :param palette: Palette for an array of indexes, as a list accepted by `palette_to_lut` or a lookup table returned by it. Tables are used as they are, without the display's colour correction.
+        :param scale: None, or 'fit' to letterbox, 'fill' to crop or 'stretch' to distort the image to the display size
+        :param resample: 'nearest' or 'bilinear' sampling when scaling, palette images always use 'nearest'
+        :param draft: Let a scaled JPEG decode at reduced size. This changes the image itself, so its size afterwards is the reduced one.
 
         """
+        if scale is not None:
+            self._display_scaled(image, palette, scale, resample, draft)
+            return
+
+        if palette is not None or getattr(image, 'mode', None) == 'P':
+            self._display_indexed(image, palette)
+            return
+
         # Set address bounds to entire display.
         self.set_window()
         # Convert image to array of 16bit 565 RGB data bytes.
         # Unfortunate that this copy has to occur, but the SPI byte writing
         # function needs to take an array of bytes and PIL doesn't natively
         # store images in 16-bit 565 RGB format.
-        pixelbytes = list(image_to_data(image, self._rotation))
+        pixelbytes = list(image_to_data(image, self._rotation, self._color_lut))
         # Write data to hardware.
         self.data(pixelbytes)
+
+    def _transfer(self):
+        """Return the reused transfer buffer as a big-endian uint16 array in display RAM order."""
+        if self._buffer is None:
+            self._buffer = bytearray(self._width * self._height * 2)
+            self._frame = np.frombuffer(self._buffer, dtype='>u2').reshape(self._height, self._width)
+        return self._frame
+
+    def _lut(self, palette):
+        if getattr(palette, 'dtype', None) == np.dtype('>u2'):
+            return palette
+        key = np.asarray(palette, dtype=np.uint8).tobytes()
+        if key != self._palette:
+            self._palette = key
+            self._palette_lut = palette_to_lut(palette, self._color_lut)
+        return self._palette_lut
+
+    def _display_indexed(self, image, palette, resample_map=None):
+        if palette is None:
+            palette = image.getpalette()
+        lut = self._lut(palette)
+        indexes = np.asarray(image, dtype=np.uint8)
+        if resample_map is None:
+            indexes = np.rot90(indexes, self._rotation // 90)
+        else:
+            indexes = indexes.reshape(-1)[resample_map.indexes[0]]
+        np.take(lut, indexes, out=self._transfer(), mode='clip')
+        self._display_transfer(resample_map)
+
+    def _display_scaled(self, image, palette, scale, resample, draft=False):
+        if draft and getattr(image, 'format', None) == 'JPEG':
+            image.draft('RGB', (self.width, self.height))
+
+        indexed = palette is not None or getattr(image, 'mode', None) == 'P'
+        pixels = np.asarray(image, dtype=np.uint8) if indexed else np.asarray(image.convert('RGB'))
+        if indexed:
+            resample = 'nearest'
+
+        key = (pixels.shape[1], pixels.shape[0], scale, resample)
+        resample_map = self._resample_maps.get(key)
+        if resample_map is None:
+            if len(self._resample_maps) >= 8:
+                self._resample_maps.clear()
+            resample_map = _resample_map(key[:2], (self.width, self.height), self._rotation, scale, resample)
+            self._resample_maps[key] = resample_map
+
+        if indexed:
+            self._display_indexed(pixels, image.getpalette() if palette is None else palette, resample_map)
+            return
+
+        pixels = pixels.reshape(-1, 3)
+        if resample_map.weights is None:
+            rgb = pixels[resample_map.indexes[0]]
+        else:
+            rgb = sum(pixels[i] * w for i, w in zip(resample_map.indexes, resample_map.weights)) >> 8
+
+        self._transfer()[...] = _pack565(rgb, self._color_lut)
+        self._display_transfer(resample_map)
+
+    def display_yuv(self, data, size, pixel_format='YUV420', scale='fill', stride=None):
+        """Write a planar YUV camera frame to the hardware.
+
+        Colour conversion (BT.601, in fixed-point), scaling to the display and 565 RGB
+        packing are done in one NumPy pass through offset maps cached per frame size.
+
+        :param data: bytes-like YUV frame, eg: a camera buffer
+        :param size: (width, height) of the frame in pixels, both even
+        :param pixel_format: 'YUV420' for separate U and V planes (I420) or 'NV12' for interleaved U, V pairs
+        :param scale: 'fit' to letterbox, 'fill' to crop or 'stretch' to distort the frame to the display size
+        :param stride: Bytes per row of the Y plane if rows are padded, defaults to the frame width
+
+        """
+        stride = size[0] if stride is None else stride
+        key = (size, stride, pixel_format, scale)
+        yuv_map = self._resample_maps.get(key)
+        if yuv_map is None:
+            if len(self._resample_maps) >= 8:
+                self._resample_maps.clear()
+            yuv_map = _yuv_map(size, stride, pixel_format, (self.width, self.height), self._rotation, scale)
+            self._resample_maps[key] = yuv_map
+
+        data = _frombuffer(data, np.uint8)
+        y, u, v = (data[i].astype(np.int32) for i in yuv_map.indexes)
+        c = 298 * (y - 16) + 128
+        u -= 128
+        v -= 128
+
+        r = np.clip((c + 409 * v) >> 8, 0, 255)
+        g = np.clip((c - 100 * u - 208 * v) >> 8, 0, 255)
+        b = np.clip((c + 516 * u) >> 8, 0, 255)
+
+        self._transfer()[...] = _pack565_channels(r, g, b, self._color_lut)
+        self._display_transfer(yuv_map)
+
+    def _display_transfer(self, resample_map=None):
+        if resample_map is not None and resample_map.border is not None:
+            self._frame[resample_map.border] = 0
+        self.display_raw(self._buffer)
+
+    @_wakes
+    def display_raw(self, data):
+        """Write pre-converted 16-bit 565 RGB bytes to the hardware.
+
+        :param data: bytes, bytearray or memoryview of big-endian 565 RGB pixels in display RAM order, see `image_to_rgb565`.
+
+        """
+        self.set_window()
+        self.data(data)
+
+    def _window(self, x, y, w, h):
+        """Map a rectangle in display coordinates to inclusive display RAM bounds."""
+        rotation = self._rotation // 90 % 4
+        if rotation == 1:
+            x, y, w, h = y, self.width - x - w, h, w
+        elif rotation == 2:
+            x, y = self.width - x - w, self.height - y - h
+        elif rotation == 3:
+            x, y, w, h = self.height - y - h, x, h, w
+        return x, y, x + w - 1, y + h - 1
+
+    @_wakes
+    def display_region(self, color, x=0, y=0):
+        """Write a rectangle of 16-bit 565 RGB values to the hardware.
+
+        The rectangle is clipped to the display, and only its pixels are sent.
+
+        :param color: NumPy array of 16-bit 565 RGB values with shape (height, width), see `image_to_rgb565`
+        :param x: Left edge of the rectangle in display coordinates
+        :param y: Top edge of the rectangle in display coordinates
+
+        """
+        h, w = color.shape
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + w, self.width), min(y + h, self.height)
+        if right <= left or bottom <= top:
+            return
+
+        color = color[top - y:bottom - y, left - x:right - x]
+        self.set_window(*self._window(left, top, right - left, bottom - top))
+        self.data(np.rot90(color, self._rotation // 90).astype('>u2').tobytes())
+
+    def set_background(self, image):
+        """Draw a background image and cache it for restoring behind moving sprites.
+
+        :param image: Should be RGB format and the same dimensions as the display hardware.
+
+        """
+        self._background = image_to_rgb565(image, lut=self._color_lut)
+        self._sprites.clear()
+        self.display_region(self._background)
+
+    def blit(self, sprite, x, y):
+        """Draw a sprite with its top-left corner at x, y.
+
+        If the sprite was already drawn, the background it uncovers is restored
+        from the cached background. Only the affected rectangles are sent.
+
+        :param sprite: `Sprite` to draw
+        :param x: Left edge of the sprite in display coordinates
+        :param y: Top edge of the sprite in display coordinates
+
+        """
+        sprite._correct(self._color_lut)
+        old = self._sprites.pop(sprite, None)
+        self._sprites[sprite] = (x, y)
+        new = (x, y, x + sprite.width, y + sprite.height)
+
+        if old is None:
+            self._redraw(*new)
+            return
+
+        old = (old[0], old[1], old[0] + sprite.width, old[1] + sprite.height)
+        if old[0] < new[2] and new[0] < old[2] and old[1] < new[3] and new[1] < old[3]:
+            # Overlapping moves are sent as one rectangle covering both
+            self._redraw(min(old[0], new[0]), min(old[1], new[1]), max(old[2], new[2]), max(old[3], new[3]))
+        else:
+            self._redraw(*old)
+            self._redraw(*new)
+
+    def erase(self, sprite):
+        """Remove a sprite, restoring the background behind it."""
+        position = self._sprites.pop(sprite, None)
+        if position is not None:
+            x, y = position
+            self._redraw(x, y, x + sprite.width, y + sprite.height)
+
+    def _redraw(self, left, top, right, bottom):
+        """Compose the background and sprites within a rectangle and send it."""
+        if self._background is None:
+            self._background = np.zeros((self.height, self.width), dtype=np.uint16)
+
+        left, top = max(left, 0), max(top, 0)
+        right, bottom = min(right, self.width), min(bottom, self.height)
+        if right <= left or bottom <= top:
+            return
+
+        region = self._background[top:bottom, left:right].copy()
+        for sprite, (x, y) in self._sprites.items():
+            l, t = max(left, x), max(top, y)
+            r, b = min(right, x + sprite.width), min(bottom, y + sprite.height)
+            if r <= l or b <= t:
+                continue
+            src = sprite.pixels[t - y:b - y, l - x:r - x]
+            dst = region[t - top:b - top, l - left:r - left]
+            if sprite.mask is None:
+                dst[...] = src
+            else:
+                np.copyto(dst, src, where=sprite.mask[t - y:b - y, l - x:r - x])
+
+        self.display_region(region, left, top)
@@ -0,0 +1,269 @@
+"""Layer compositing with dirty-region updates.
+
+A screen is built from layers stacked bottom to top: typically a static
+background, some semi-static panels and a few fast-changing widgets. Each
+layer caches its content as 16-bit 565 RGB values, with an optional 1-bit
+mask or 8-bit alpha, and records the regions that changed. Only those
+regions are recomposed and sent to the display.
+"""
+import numpy as np
+
+from . import _pack565
+
+
+def _intersect(a, b):
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[2], b[2]), min(a[3], b[3])
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return x0, y0, x1, y1
+
+
+def merge_rects(rects):
+    """Merge overlapping or touching (x0, y0, x1, y1) rectangles into their bounding boxes."""
+    merged = []
+    for rect in rects:
+        rect = tuple(rect)
+        overlapping = True
+        while overlapping:
+            overlapping = False
+            for other in merged:
+                if rect[0] <= other[2] and other[0] <= rect[2] and rect[1] <= other[3] and other[1] <= rect[3]:
+                    merged.remove(other)
+                    rect = (min(rect[0], other[0]), min(rect[1], other[1]), max(rect[2], other[2]), max(rect[3], other[3]))
+                    overlapping = True
+                    break
+        merged.append(rect)
+    return merged
+
+
+def blend565(src, dst, alpha):
+    """Blend 16-bit 565 RGB src over dst with 8-bit alpha, returning 565 RGB values."""
+    alpha = alpha.astype(np.uint32)
+    inverse = 255 - alpha
+    src = src.astype(np.uint32)
+    dst = dst.astype(np.uint32)
+    result = np.zeros(src.shape, dtype=np.uint32)
+    for shift, bits in ((11, 0x1F), (5, 0x3F), (0, 0x1F)):
+        channel = ((src >> shift) & bits) * alpha + ((dst >> shift) & bits) * inverse
+        result |= ((channel + 127) // 255) << shift
+    return result.astype(np.uint16)
+
+
+class Layer(object):
+    """A rectangle of cached 565 RGB content positioned on the display."""
+
+    def __init__(self, width, height, x=0, y=0, alpha=None):
+        """Create a layer, initially transparent if it has alpha or black if not.
+
+        :param width: Width of the layer in pixels
+        :param height: Height of the layer in pixels
+        :param x: Left edge of the layer in display coordinates
+        :param y: Top edge of the layer in display coordinates
+        :param alpha: None for an opaque layer, '1' for a 1-bit mask or 'L' for 8-bit alpha
+
+        """
+        if alpha not in (None, '1', 'L'):
+            raise ValueError("Unsupported alpha mode: {}".format(alpha))
+
+        self.x = x
+        self.y = y
+        self.visible = True
+        # Colour correction tables the pixels were converted with, kept in step with the display by Compositor
+        self.lut = None
+        self.pixels = np.zeros((height, width), dtype=np.uint16)
+        # RGB source of pixels drawn from images and colours, so they can be converted again when the correction changes
+        self._rgb = np.zeros((height, width, 3), dtype=np.uint8)
+        self._from_rgb = np.zeros((height, width), dtype=bool)
+        self.alpha = None
+        if alpha == '1':
+            self.alpha = np.zeros((height, width), dtype=bool)
+        elif alpha == 'L':
+            self.alpha = np.zeros((height, width), dtype=np.uint8)
+        self._dirty = []
+        self.invalidate()
+
+    @property
+    def width(self):
+        return self.pixels.shape[1]
+
+    @property
+    def height(self):
+        return self.pixels.shape[0]
+
+    @property
+    def rect(self):
+        """The layer's (x0, y0, x1, y1) rectangle in display coordinates, exclusive of x1 and y1."""
+        return self.x, self.y, self.x + self.width, self.y + self.height
+
+    def invalidate(self, rect=None):
+        """Mark a rectangle of the layer, in layer coordinates, as needing to be redrawn.
+
+        :param rect: (x0, y0, x1, y1) rectangle, or None for the whole layer
+
+        """
+        if rect is None:
+            rect = (0, 0, self.width, self.height)
+        self._dirty.append((self.x + rect[0], self.y + rect[1], self.x + rect[2], self.y + rect[3]))
+
+    def draw(self, image, x=0, y=0):
+        """Draw into the layer with the top-left corner at x, y in layer coordinates.
+
+        An RGBA image's alpha channel is stored as the layer's mask or alpha, images
+        without one are drawn opaque. Images follow the colour correction of the
+        display the layer is added to, arrays are used as they are. Anything outside
+        the layer is clipped.
+
+        :param image: PIL image, or NumPy array of 16-bit 565 RGB values
+        :param x: Left edge in layer coordinates
+        :param y: Top edge in layer coordinates
+
+        """
+        alpha = rgb = None
+        if hasattr(image, 'convert'):
+            if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+                image = image.convert('RGBA')
+                alpha = np.array(image)[:, :, 3]
+            rgb = np.array(image.convert('RGB'))
+            image = _pack565(rgb, self.lut)
+
+        h, w = image.shape
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + w, self.width), min(y + h, self.height)
+        if right <= left or bottom <= top:
+            return
+
+        src = slice(top - y, bottom - y), slice(left - x, right - x)
+        dst = slice(top, bottom), slice(left, right)
+        self.pixels[dst] = image[src]
+        self._from_rgb[dst] = rgb is not None
+        if rgb is not None:
+            self._rgb[dst] = rgb[src]
+        if self.alpha is not None:
+            if alpha is None:
+                self.alpha[dst] = True if self.alpha.dtype == bool else 255
+            elif self.alpha.dtype == bool:
+                self.alpha[dst] = alpha[src] >= 128
+            else:
+                self.alpha[dst] = alpha[src]
+        self.invalidate((left, top, right, bottom))
+
+    def fill(self, colour, opacity=255):
+        """Fill the whole layer with an (r, g, b) colour, at an opacity from 0 to 255 if it has alpha."""
+        self._rgb[...] = colour
+        self._from_rgb[...] = True
+        self.pixels[...] = _pack565(np.array(colour, dtype=np.uint8), self.lut)
+        if self.alpha is not None:
+            self.alpha[...] = opacity >= 128 if self.alpha.dtype == bool else opacity
+        self.invalidate()
+
+    def _correct(self, lut):
+        """Convert pixels drawn from images and colours again if lut differs from the tables they were converted with."""
+        if lut is self.lut:
+            return
+        self.lut = lut
+        if self._from_rgb.any():
+            self.pixels[self._from_rgb] = _pack565(self._rgb[self._from_rgb], lut)
+            self.invalidate()
+
+    def move(self, x, y):
+        """Move the layer, redrawing both the area it leaves and the area it covers."""
+        self.invalidate()
+        self.x, self.y = x, y
+        self.invalidate()
+
+    def show(self):
+        self.visible = True
+        self.invalidate()
+
+    def hide(self):
+        self.visible = False
+        self.invalidate()
+
+
+class Compositor(object):
+    """Compose layers onto an ST7735 display, sending only the regions that changed."""
+
+    def __init__(self, display, background=(0, 0, 0)):
+        """Create a compositor.
+
+        :param display: ST7735 instance to draw on
+        :param background: (r, g, b) colour shown where no layer covers the display
+
+        """
+        self._display = display
+        self.background = tuple(background)
+        self.layers = []
+        self._dirty = [(0, 0, display.width, display.height)]
+        self._lut = display._color_lut
+
+    def add_layer(self, layer):
+        """Add a layer on top of the existing layers.
+
+        The layer's images and colours are converted with the display's colour
+        correction, and again whenever it changes.
+
+        """
+        layer._correct(self._display._color_lut)
+        self.layers.append(layer)
+        layer.invalidate()
+        return layer
+
+    def remove_layer(self, layer):
+        self.layers.remove(layer)
+        self._dirty.append(layer.rect)
+
+    def compose(self, rect):
+        """Compose the layers within an (x0, y0, x1, y1) rectangle, returning 565 RGB values."""
+        x0, y0, x1, y1 = rect
+        background = _pack565(np.array(self.background, dtype=np.uint8), self._display._color_lut)
+        region = np.full((y1 - y0, x1 - x0), background, dtype=np.uint16)
+
+        for layer in self.layers:
+            if not layer.visible:
+                continue
+            overlap = _intersect(rect, layer.rect)
+            if overlap is None:
+                continue
+            l, t, r, b = overlap
+            src = layer.pixels[t - layer.y:b - layer.y, l - layer.x:r - layer.x]
+            dst = region[t - y0:b - y0, l - x0:r - x0]
+            if layer.alpha is None:
+                dst[...] = src
+                continue
+            alpha = layer.alpha[t - layer.y:b - layer.y, l - layer.x:r - layer.x]
+            if alpha.dtype == bool:
+                np.copyto(dst, src, where=alpha)
+            else:
+                dst[...] = blend565(src, dst, alpha)
+
+        return region
+
+    def update(self):
+        """Recompose and send every region that changed since the last update.
+
+        Layers and the background follow any change to the display's colour
+        correction. Returns the list of (x0, y0, x1, y1) rectangles that were sent.
+
+        """
+        lut = self._display._color_lut
+        if lut is not self._lut:
+            self._lut = lut
+            self._dirty.append((0, 0, self._display.width, self._display.height))
+        for layer in self.layers:
+            layer._correct(lut)
+
+        dirty = self._dirty
+        self._dirty = []
+        for layer in self.layers:
+            dirty.extend(layer._dirty)
+            layer._dirty = []
+
+        screen = (0, 0, self._display.width, self._display.height)
+        rects = [rect for rect in (_intersect(rect, screen) for rect in dirty) if rect is not None]
+        rects = merge_rects(rects)
+
+        for rect in rects:
+            self._display.display_region(self.compose(rect), rect[0], rect[1])
+
+        return rects
@@ -0,0 +1,182 @@
+"""Multi-process frame preparation for GIF, video and slideshow playback.
+
+Decoding, resizing and 565 RGB conversion are spread across a pool of worker
+processes. Each worker writes its finished frame into a slot of a shared
+memory ring, and frames are handed back in order to a single display writer.
+
+Animation frames can only be decoded in order, since each one is drawn over
+the last, so they are decoded here and only resized and converted in the pool.
+"""
+import collections
+import multiprocessing
+import time
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+import numpy as np
+from PIL import Image
+
+from . import image_to_rgb565
+
+
+# Per-worker state, so each process attaches to the ring once
+_worker = {'ring': None}
+
+
+def _attach(name):
+    ring = _worker['ring']
+    if ring is None or ring.name != name:
+        ring = shared_memory.SharedMemory(name=name)
+        _worker['ring'] = ring
+    return ring
+
+
+def _prepare(name, offset, source, size, rotation, lut):
+    """Worker: decode, resize and convert one frame into the shared ring."""
+    image = source if isinstance(source, Image.Image) else Image.open(source)
+
+    if image.size != size:
+        image = image.resize(size)
+
+    color = image_to_rgb565(image, rotation, lut)
+    ring = _attach(name)
+    out = np.ndarray(color.shape, dtype='>u2', buffer=ring.buf, offset=offset)
+    out[...] = color
+
+
+def image_frames(path):
+    """Return a list of ``(path, frame)`` sources for every frame in an image file."""
+    with Image.open(path) as image:
+        return [(path, frame) for frame in range(getattr(image, 'n_frames', 1))]
+
+
+class FramePipeline(object):
+    """Prepare frames for an ST7735 display in a pool of worker processes."""
+
+    def __init__(self, display, processes=None, lookahead=None):
+        """Create a frame pipeline for a display.
+
+        :param display: ST7735 instance to write frames to
+        :param processes: Number of worker processes, defaults to one less than the CPU count
+        :param lookahead: Number of frames prepared ahead of the display, defaults to twice the worker count
+
+        """
+        if shared_memory is None:
+            raise RuntimeError("FramePipeline requires Python 3.8 or later for multiprocessing.shared_memory")
+
+        if processes is None:
+            processes = max(1, multiprocessing.cpu_count() - 1)
+
+        if lookahead is None:
+            lookahead = processes * 2
+
+        self._display = display
+        self._processes = processes
+        self._lookahead = lookahead
+        self._size = (display.width, display.height)
+        self._frame_size = display.width * display.height * 2
+        self._ring = None
+        self._pool = None
+        self._path = None
+        self._image = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self):
+        """Start the worker pool and allocate the shared frame ring."""
+        if self._pool is not None:
+            return
+        self._ring = shared_memory.SharedMemory(create=True, size=self._frame_size * self._lookahead)
+        self._pool = multiprocessing.Pool(self._processes)
+
+    def close(self):
+        """Stop the worker pool and release the shared frame ring."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        if self._ring is not None:
+            self._ring.close()
+            self._ring.unlink()
+            self._ring = None
+        if self._image is not None:
+            self._image.close()
+            self._path = None
+            self._image = None
+
+    def _decode(self, path, frame):
+        """Decode one animation frame, seeking forwards through the file from the last one."""
+        # Frames can only be seeked forwards, so rewinding means reopening
+        if self._image is None or self._path != path or self._image.tell() > frame:
+            if self._image is not None:
+                self._image.close()
+            self._image = Image.open(path)
+            self._path = path
+        self._image.seek(frame)
+        # Workers get a copy, the file's image is drawn over by the next frame
+        return self._image.convert('RGB')
+
+    def frames(self, sources):
+        """Prepare sources in parallel and yield finished frames in order.
+
+        Each frame is a memoryview into the shared ring holding big-endian
+        565 RGB bytes, and is only valid until the next frame is requested.
+
+        :param sources: Iterable of file paths, ``(path, frame)`` tuples or PIL images. ``(path, frame)`` tuples are decoded here, in order.
+
+        """
+        self.start()
+        pending = collections.deque()
+        frame = None
+
+        try:
+            for index, source in enumerate(sources):
+                if len(pending) == self._lookahead:
+                    frame = self._collect(*pending.popleft())
+                    yield frame
+                    frame.release()
+                # The slot being filled was yielded lookahead frames ago and is free again
+                offset = (index % self._lookahead) * self._frame_size
+                if isinstance(source, tuple):
+                    source = self._decode(*source)
+                args = (self._ring.name, offset, source, self._size, self._display._rotation, self._display._color_lut)
+                pending.append((offset, self._pool.apply_async(_prepare, args)))
+
+            while pending:
+                frame = self._collect(*pending.popleft())
+                yield frame
+                frame.release()
+        finally:
+            # Views into the ring must be released before it can be closed
+            if frame is not None:
+                frame.release()
+
+    def _collect(self, offset, result):
+        result.get()
+        return self._ring.buf[offset:offset + self._frame_size]
+
+    def play(self, sources, fps=None):
+        """Prepare sources in parallel and write them to the display in order.
+
+        :param sources: Iterable of file paths, ``(path, frame)`` tuples or PIL images
+        :param fps: Maximum frame rate, or None to display frames as soon as they are ready
+
+        """
+        frame_time = 1.0 / fps if fps else 0
+        t_next = time.time()
+
+        for frame in self.frames(sources):
+            if frame_time:
+                delay = t_next - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                t_next += frame_time
+            self._display.display_raw(frame)
@@ -0,0 +1,151 @@
+"""Bandwidth-budgeted region updates.
+
+At a few MHz a full frame takes tens of milliseconds on the bus, so a large,
+unimportant redraw can hold up a small, urgent one. The scheduler keeps a
+framebuffer of what the screen should show, and each tick sends pending
+regions in priority order until a byte budget is spent. Large regions are
+split across ticks and overlapping pending regions of the same priority are
+merged. Regions of different priorities are kept apart, so a small urgent
+update is never folded into a large redraw queued behind it.
+"""
+import itertools
+import time
+
+import numpy as np
+
+from . import image_to_rgb565
+
+
+# Approximate command and parameter bytes sent by set_window for each region
+WINDOW_OVERHEAD = 11
+
+
+class _Update(object):
+    def __init__(self, rect, priority, deadline, sequence):
+        self.rect = rect
+        self.priority = priority
+        self.deadline = deadline
+        self.sequence = sequence
+
+    def overlaps(self, rect):
+        return rect[0] <= self.rect[2] and self.rect[0] <= rect[2] and rect[1] <= self.rect[3] and self.rect[1] <= rect[3]
+
+    def key(self, now):
+        overdue = self.deadline is not None and self.deadline <= now
+        deadline = self.deadline if self.deadline is not None else float('inf')
+        return (not overdue, -self.priority, deadline, self.sequence)
+
+
+class UpdateScheduler(object):
+    """Send region updates to an ST7735 display within a per-tick byte budget."""
+
+    def __init__(self, display, budget=None, tick_hz=60, background=None):
+        """Create an update scheduler.
+
+        The scheduler owns the screen contents: merged regions are sent from its
+        framebuffer, which starts black or as the given background image.
+
+        :param display: ST7735 instance to draw on
+        :param budget: Bytes to send per tick, defaults to what the SPI bus can carry in 1 / tick_hz seconds
+        :param tick_hz: Expected tick rate, used for the default budget
+        :param background: Optional PIL image the screen already shows
+
+        """
+        if budget is None:
+            budget = int(display._spi.max_speed_hz) // 8 // tick_hz
+
+        self._display = display
+        self.budget = budget
+        self.framebuffer = np.zeros((display.height, display.width), dtype=np.uint16)
+        if background is not None:
+            self.framebuffer[...] = image_to_rgb565(background, lut=display._color_lut)
+        self._pending = []
+        self._sequence = itertools.count()
+
+    @property
+    def pending(self):
+        """Number of regions waiting to be sent."""
+        return len(self._pending)
+
+    def submit(self, pixels, x=0, y=0, priority=0, deadline=None):
+        """Queue a region update.
+
+        :param pixels: NumPy array of 16-bit 565 RGB values with shape (height, width)
+        :param x: Left edge of the region in display coordinates
+        :param y: Top edge of the region in display coordinates
+        :param priority: Higher priorities are sent first
+        :param deadline: Seconds from now after which the update is sent before any other priority
+
+        """
+        h, w = pixels.shape
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + w, self._display.width), min(y + h, self._display.height)
+        if right <= left or bottom <= top:
+            return
+
+        self.framebuffer[top:bottom, left:right] = pixels[top - y:bottom - y, left - x:right - x]
+
+        if deadline is not None:
+            deadline += time.time()
+
+        update = _Update((left, top, right, bottom), priority, deadline, next(self._sequence))
+        # Fold every pending update of the same priority this one touches into it, the framebuffer has
+        # the latest pixels. Overlaps with other priorities just send those pixels twice.
+        for other in [other for other in self._pending if other.priority == priority and other.overlaps(update.rect)]:
+            self._pending.remove(other)
+            update.rect = (min(update.rect[0], other.rect[0]), min(update.rect[1], other.rect[1]),
+                           max(update.rect[2], other.rect[2]), max(update.rect[3], other.rect[3]))
+            update.sequence = min(update.sequence, other.sequence)
+            if other.deadline is not None:
+                update.deadline = other.deadline if update.deadline is None else min(update.deadline, other.deadline)
+        self._pending.append(update)
+
+    def tick(self):
+        """Send pending updates, most urgent first, until this tick's budget is spent.
+
+        An update too large for what is left of the budget has as many rows as fit
+        sent now, or the start of its first row if a row is wider than the whole
+        budget, and the rest stays queued. At least one pixel is sent every tick,
+        however small the budget, so the queue always drains. Returns the number
+        of bytes sent.
+
+        """
+        now = time.time()
+        self._pending.sort(key=lambda update: update.key(now))
+        remaining = self.budget
+        sent = 0
+
+        while self._pending:
+            update = self._pending[0]
+            x0, y0, x1, y1 = update.rect
+            row_bytes = (x1 - x0) * 2
+            available = max(remaining - WINDOW_OVERHEAD, 0 if sent else 2)
+            rows = min(available // row_bytes, y1 - y0)
+
+            if rows < 1 and row_bytes + WINDOW_OVERHEAD <= self.budget:
+                # A row fits in a whole tick, so the update waits for the next one rather than being split
+                break
+
+            if rows >= 1:
+                self._display.display_region(self.framebuffer[y0:y0 + rows, x0:x1], x0, y0)
+                cost = WINDOW_OVERHEAD + rows * row_bytes
+                if y0 + rows < y1:
+                    update.rect = (x0, y0 + rows, x1, y1)
+                else:
+                    self._pending.pop(0)
+            else:
+                columns = available // 2
+                if columns < 1:
+                    break
+                # Not even one row fits in a tick, so send the start of the first row and
+                # leave the rest of it queued ahead of the rows below
+                self._display.display_region(self.framebuffer[y0:y0 + 1, x0:x0 + columns], x0, y0)
+                cost = WINDOW_OVERHEAD + columns * 2
+                update.rect = (x0 + columns, y0, x1, y0 + 1)
+                if y0 + 1 < y1:
+                    self._pending.insert(1, _Update((x0, y0 + 1, x1, y1), update.priority, update.deadline, update.sequence))
+
+            remaining -= cost
+            sent += cost
+
+        return sent
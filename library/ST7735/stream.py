@@ -0,0 +1,173 @@
+"""Raw video input from a pipe, FIFO or file.
+
+Fixed-size frames are read straight into reused buffers, so a stream from
+``ffmpeg -f rawvideo`` or a camera tool can be shown without going through
+PIL for every frame.
+"""
+import collections
+import threading
+
+import numpy as np
+
+from . import _pack565, _frombuffer
+
+
+BACKPRESSURE_BLOCK = 'block'
+BACKPRESSURE_LATEST = 'latest'
+
+# Bytes per pixel for each supported raw pixel format
+PIXEL_FORMATS = {
+    'RGB565': 2,    # Big-endian, ffmpeg -pix_fmt rgb565be
+    'RGB565LE': 2,  # Little-endian, ffmpeg -pix_fmt rgb565le
+    'RGB24': 3,     # ffmpeg -pix_fmt rgb24
+}
+
+
+def _readinto(stream, buf):
+    """Fill buf from stream, returning False if it ends before buf is full."""
+    view = memoryview(buf)
+    count = 0
+    while count < len(view):
+        read = stream.readinto(view[count:])
+        if not read:
+            return False
+        count += read
+    return True
+
+
+def read_frames(stream, frame_size):
+    """Generator yielding fixed-size frames read from a binary stream.
+
+    Every frame is a memoryview of the same reused buffer, so it is only
+    valid until the next frame is read. A partial frame at the end of the
+    stream is discarded.
+
+    :param stream: Binary stream supporting readinto, eg: sys.stdin.buffer
+    :param frame_size: Size of one frame in bytes
+
+    """
+    buf = bytearray(frame_size)
+    view = memoryview(buf)
+    while _readinto(stream, buf):
+        yield view
+
+
+class RawVideoStream(object):
+    """Show raw video frames from a binary stream on an ST7735 display."""
+
+    def __init__(self, display, stream, pixel_format='RGB565', backpressure=BACKPRESSURE_BLOCK):
+        """Create a raw video stream for a display.
+
+        Frames must be the same size as the display: display.width by display.height pixels.
+
+        :param display: ST7735 instance to write frames to
+        :param stream: Binary stream supporting readinto, eg: sys.stdin.buffer or an open FIFO
+        :param pixel_format: One of 'RGB565', 'RGB565LE' or 'RGB24'
+        :param backpressure: 'block' to show every frame, or 'latest' to drop frames the display cannot keep up with
+
+        """
+        if pixel_format not in PIXEL_FORMATS:
+            raise ValueError("Unsupported pixel format: {}".format(pixel_format))
+
+        if backpressure not in (BACKPRESSURE_BLOCK, BACKPRESSURE_LATEST):
+            raise ValueError("Unsupported backpressure policy: {}".format(backpressure))
+
+        self._display = display
+        self._stream = stream
+        self._format = pixel_format
+        self._backpressure = backpressure
+        self._shape = (display.height, display.width)
+        self._frame_size = display.width * display.height * PIXEL_FORMATS[pixel_format]
+        self._rotation = display._rotation // 90
+
+        # Frames that are already big-endian and in display RAM order are sent as-is
+        self._passthrough = pixel_format == 'RGB565' and self._rotation == 0
+        self._buffer = bytearray(display.width * display.height * 2)
+        self._out = np.frombuffer(self._buffer, dtype='>u2').reshape(display._height, display._width)
+
+        self.dropped = 0
+
+    def frames(self):
+        """Generator yielding raw frames from the stream, applying the backpressure policy."""
+        if self._backpressure == BACKPRESSURE_LATEST:
+            return self._latest_frames()
+        return read_frames(self._stream, self._frame_size)
+
+    def _latest_frames(self):
+        # Three buffers: one being read, one waiting and one being displayed
+        free = collections.deque(bytearray(self._frame_size) for _ in range(3))
+        state = {'latest': None, 'done': False, 'error': None, 'stop': False}
+        ready = threading.Condition()
+
+        def reader():
+            try:
+                while not state['stop']:
+                    with ready:
+                        buf = free.popleft()
+                    if not _readinto(self._stream, buf):
+                        break
+                    with ready:
+                        if state['stop']:
+                            break
+                        if state['latest'] is not None:
+                            free.append(state['latest'])
+                            self.dropped += 1
+                        state['latest'] = buf
+                        ready.notify()
+            except Exception as e:
+                state['error'] = e
+            finally:
+                with ready:
+                    state['done'] = True
+                    ready.notify()
+
+        thread = threading.Thread(target=reader)
+        thread.daemon = True
+        thread.start()
+
+        try:
+            while True:
+                with ready:
+                    while state['latest'] is None and not state['done']:
+                        ready.wait()
+                    buf = state['latest']
+                    state['latest'] = None
+
+                if buf is None:
+                    if state['error'] is not None:
+                        raise state['error']
+                    return
+
+                yield memoryview(buf)
+
+                with ready:
+                    free.append(buf)
+        finally:
+            # Stop the reader once the consumer is done, rather than draining the stream
+            with ready:
+                state['stop'] = True
+
+    def convert(self, frame):
+        """Convert a raw frame to big-endian 565 RGB bytes in display RAM order.
+
+        Returns the frame itself when no conversion is needed, otherwise a
+        buffer that is reused for every frame.
+
+        """
+        if self._passthrough:
+            return frame
+
+        if self._format == 'RGB24':
+            color = _pack565(_frombuffer(frame, np.uint8).reshape(self._shape + (3,)), self._display._color_lut)
+        elif self._format == 'RGB565LE':
+            color = _frombuffer(frame, '<u2').reshape(self._shape)
+        else:
+            color = _frombuffer(frame, '>u2').reshape(self._shape)
+
+        self._out[...] = np.rot90(color, self._rotation)
+        return self._buffer
+
+    def play(self):
+        """Show frames from the stream until it ends."""
+        for frame in self.frames():
+            self._display.display_raw(self.convert(frame))
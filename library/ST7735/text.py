@@ -0,0 +1,162 @@
+"""Fast text drawing from pre-rendered glyph atlases.
+
+A font is rasterized once, in a given colour on a given background, into an
+atlas of 16-bit 565 RGB glyphs. Strings are then composed by gathering glyph
+columns with NumPy, and only the text's bounding box is written to the display.
+"""
+import collections
+import string
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from . import _pack565
+
+
+# Number of atlases kept by glyph_atlas before the least recently used is discarded
+ATLAS_CACHE_SIZE = 8
+
+DEFAULT_CHARACTERS = string.digits + string.ascii_letters + string.punctuation + ' '
+
+_atlases = collections.OrderedDict()
+
+
+def _advance(font, character):
+    if hasattr(font, 'getlength'):
+        return int(round(font.getlength(character)))
+    return font.getsize(character)[0]
+
+
+def _line_height(font):
+    if hasattr(font, 'getmetrics'):
+        ascent, descent = font.getmetrics()
+        return ascent + descent
+    return font.getsize('Ay')[1]
+
+
+class GlyphAtlas(object):
+    """A font rendered once into a strip of 16-bit 565 RGB glyphs."""
+
+    def __init__(self, font, fill=(255, 255, 255), background=(0, 0, 0), characters=DEFAULT_CHARACTERS, lut=None):
+        """Render a font into a glyph atlas.
+
+        Glyphs are anti-aliased against the background colour.
+
+        :param font: PIL ImageFont to render
+        :param fill: Text colour as an (r, g, b) tuple
+        :param background: Background colour as an (r, g, b) tuple
+        :param characters: Characters to render up front, others are added when first used
+        :param lut: Optional colour correction tables from `ST7735.color_correction_lut`
+
+        """
+        self.font = font
+        self.fill = tuple(fill)
+        self.background = tuple(background)
+        self.lut = lut
+        self.height = _line_height(font)
+        self._background = _pack565(np.array(self.background, dtype=np.uint8), lut)
+        self._build(set(characters))
+
+    def _build(self, characters):
+        characters = sorted(characters)
+        advances = [_advance(self.font, character) for character in characters]
+
+        image = Image.new('RGB', (max(sum(advances), 1), self.height), self.background)
+
+        self._columns = {}
+        offset = 0
+        for character, advance in zip(characters, advances):
+            # Each glyph is drawn in its own cell so overhangs can't spill into its neighbours
+            cell = Image.new('RGB', (max(advance, 1), self.height), self.background)
+            ImageDraw.Draw(cell).text((0, 0), character, font=self.font, fill=self.fill)
+            image.paste(cell, (offset, 0))
+            self._columns[character] = np.arange(offset, offset + advance)
+            offset += advance
+
+        self.pixels = _pack565(np.array(image), self.lut)
+
+    def columns(self, text):
+        """Return the atlas column indexes that make up text."""
+        missing = set(text) - set(self._columns)
+        if missing:
+            self._build(missing | set(self._columns))
+        if not text:
+            return np.arange(0)
+        return np.concatenate([self._columns[character] for character in text])
+
+    def text_width(self, text):
+        """Return the width of text in pixels."""
+        return len(self.columns(text))
+
+    def render(self, text, width=None):
+        """Compose text into a NumPy array of 16-bit 565 RGB values.
+
+        :param text: String to render
+        :param width: Pad with background colour or crop to this width in pixels
+
+        """
+        columns = self.columns(text)
+        pixels = self.pixels[:, columns]
+        if width is not None:
+            if width > pixels.shape[1]:
+                padding = np.full((self.height, width - pixels.shape[1]), self._background, dtype=pixels.dtype)
+                pixels = np.hstack((pixels, padding))
+            else:
+                pixels = pixels[:, :width]
+        return pixels
+
+
+def glyph_atlas(font, fill=(255, 255, 255), background=(0, 0, 0), lut=None):
+    """Return a cached glyph atlas for a font, size, colour and colour correction.
+
+    The most recently used ATLAS_CACHE_SIZE atlases are kept.
+
+    """
+    # Cached atlases hold their tables, so a table's id is unique while it is in the cache
+    key = (getattr(font, 'path', id(font)), getattr(font, 'size', None), getattr(font, 'index', 0), tuple(fill), tuple(background), id(lut))
+    atlas = _atlases.pop(key, None)
+    if atlas is None:
+        atlas = GlyphAtlas(font, fill, background, lut=lut)
+    _atlases[key] = atlas
+    while len(_atlases) > ATLAS_CACHE_SIZE:
+        _atlases.popitem(last=False)
+    return atlas
+
+
+class TextRenderer(object):
+    """Draw text on an ST7735 display from a cached glyph atlas."""
+
+    def __init__(self, display, font, fill=(255, 255, 255), background=(0, 0, 0)):
+        """Create a text renderer.
+
+        :param display: ST7735 instance to draw on
+        :param font: PIL ImageFont to draw with
+        :param fill: Text colour as an (r, g, b) tuple
+        :param background: Background colour as an (r, g, b) tuple
+
+        """
+        self._display = display
+        self.atlas = glyph_atlas(font, fill, background, display._color_lut)
+
+    @property
+    def height(self):
+        return self.atlas.height
+
+    def draw(self, text, x, y, width=None):
+        """Draw text with its top-left corner at x, y.
+
+        Only the text's bounding box is written to the display. Pass a width to
+        also clear the space left behind by longer, previously drawn text.
+
+        :param text: String to draw
+        :param x: Left edge of the text, may be off screen
+        :param y: Top edge of the text, may be off screen
+        :param width: Pad with background colour or crop to this width in pixels
+
+        """
+        if self.atlas.lut is not self._display._color_lut:
+            # Colour correction changed since the atlas was rendered
+            self.atlas = glyph_atlas(self.atlas.font, self.atlas.fill, self.atlas.background, self._display._color_lut)
+        pixels = self.atlas.render(text, width)
+        self._display.display_region(pixels, x, y)
+        return pixels.shape[1], pixels.shape[0]
@@ -0,0 +1,346 @@
+"""Capture, replay and analyse the SPI traffic sent to an ST7735 display.
+
+A trace records every `ST7735.send` call: whether it was a command or data,
+when it started, how long it took and, optionally, the bytes themselves.
+Replaying a trace against a simulated panel rebuilds the frames that were
+shown, and the report breaks down where the bus time went.
+
+Record a trace with::
+
+    disp.start_trace('ui.trace')
+    ...
+    disp.stop_trace()
+
+Then analyse it with::
+
+    python -m ST7735.trace report ui.trace
+    python -m ST7735.trace replay ui.trace frames/
+
+Analysis only needs NumPy, and PIL for replay, so traces can be copied off
+the Pi and examined on a machine without spidev or RPi.GPIO.
+
+"""
+import argparse
+import collections
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from . import ST7735_CASET, ST7735_RASET, ST7735_RAMWR, ST7735_COLS, ST7735_ROWS
+
+
+MAGIC = b'ST7735T1'
+
+FLAG_PAYLOAD = 0x01
+
+# magic, flags, width, height, offset_left, offset_top, rotation, spi_speed_hz
+_HEADER = struct.Struct('<8sBHHHHHI')
+
+# is_data, start (us from trace start), duration (us), length
+_RECORD = struct.Struct('<BQII')
+
+Header = collections.namedtuple('Header', ('payload', 'width', 'height', 'offset_left', 'offset_top', 'rotation', 'spi_speed_hz'))
+Record = collections.namedtuple('Record', ('is_data', 'start', 'duration', 'length', 'payload'))
+
+
+def _to_bytes(data):
+    if isinstance(data, memoryview):
+        # bytes() of a memoryview is its repr on Python 2
+        return data.tobytes()
+    if isinstance(data, (bytes, bytearray)):
+        return bytes(data)
+    return bytes(bytearray(data))
+
+
+class TraceWriter(object):
+    """Write a binary trace of the traffic sent to a display."""
+
+    def __init__(self, file, display, payload=True):
+        """Start a trace.
+
+        :param file: Path or binary file object to write to
+        :param display: ST7735 instance being traced
+        :param payload: Record the data bytes sent as well as their sizes, needed to rebuild frames. Commands are always recorded.
+
+        """
+        self._close = not hasattr(file, 'write')
+        self._file = open(file, 'wb') if self._close else file
+        self._payload = payload
+        self._start = time.time()
+        self._file.write(_HEADER.pack(
+            MAGIC, FLAG_PAYLOAD if payload else 0,
+            display._width, display._height,
+            display._offset_left, display._offset_top,
+            display._rotation, int(display._spi.max_speed_hz)))
+
+    def record(self, is_data, data, start, end):
+        """Record one call to send, with its start and end times from time.time().
+
+        Data is only copied when its payload is recorded, so traces without payloads
+        add as little time as possible to the sends they measure.
+
+        """
+        self._file.write(_RECORD.pack(
+            1 if is_data else 0,
+            int((start - self._start) * 1000000),
+            int((end - start) * 1000000),
+            # Buffers report their size in bytes, lists of byte values their length
+            getattr(data, 'nbytes', None) or len(data)))
+        if self._payload or not is_data:
+            self._file.write(_to_bytes(data))
+
+    def close(self):
+        if self._close:
+            self._file.close()
+        else:
+            self._file.flush()
+
+
+def read_trace(file):
+    """Read a trace, returning its Header and a generator of Records.
+
+    A file opened from a path is closed once the records are exhausted or the
+    generator is closed.
+
+    :param file: Path or binary file object to read from
+
+    """
+    close = not hasattr(file, 'read')
+    if close:
+        file = open(file, 'rb')
+
+    try:
+        header = file.read(_HEADER.size)
+        if len(header) < _HEADER.size or header[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not an ST7735 trace")
+    except Exception:
+        if close:
+            file.close()
+        raise
+    fields = _HEADER.unpack(header)
+    header = Header(bool(fields[1] & FLAG_PAYLOAD), *fields[2:])
+
+    def records():
+        try:
+            while True:
+                record = file.read(_RECORD.size)
+                if len(record) < _RECORD.size:
+                    return
+                is_data, start, duration, length = _RECORD.unpack(record)
+                payload = file.read(length) if header.payload or not is_data else None
+                yield Record(bool(is_data), start, duration, length, payload)
+        finally:
+            if close:
+                file.close()
+
+    return header, records()
+
+
+class SimulatedPanel(object):
+    """Display RAM of an ST7735, updated from recorded commands and data."""
+
+    def __init__(self, header):
+        self._header = header
+        self.ram = np.zeros((ST7735_ROWS, ST7735_COLS), dtype=np.uint16)
+        self._command = None
+        self._params = bytearray()
+        self._window = [0, 0, ST7735_COLS - 1, ST7735_ROWS - 1]
+        self._pixels = bytearray()
+
+    def command(self, payload):
+        self.flush()
+        self._command = bytearray(payload)[-1] if payload else None
+        self._params = bytearray()
+        self._pixels = bytearray()
+
+    def data(self, payload):
+        if self._command == ST7735_RAMWR:
+            self._pixels += payload
+            return
+
+        self._params += payload
+        if len(self._params) >= 4 and self._command in (ST7735_CASET, ST7735_RASET):
+            start, end = struct.unpack('>HH', bytes(self._params[:4]))
+            axis = 0 if self._command == ST7735_CASET else 1
+            self._window[axis] = start
+            self._window[axis + 2] = end
+
+    def flush(self):
+        """Write any pending RAMWR pixels into RAM, returning True if there were any."""
+        if self._command != ST7735_RAMWR or len(self._pixels) < 2:
+            return False
+
+        x0, y0, x1, y1 = self._window
+        window = self.ram[y0:y1 + 1, x0:x1 + 1]
+        pixels = np.frombuffer(bytes(self._pixels[:len(self._pixels) // 2 * 2]), dtype='>u2')
+        flat = window.reshape(-1)
+        count = min(len(pixels), flat.size)
+        flat[:count] = pixels[:count]
+        self.ram[y0:y1 + 1, x0:x1 + 1] = flat.reshape(window.shape)
+        self._pixels = bytearray()
+        return True
+
+    def image(self):
+        """Return the visible area as a PIL image, in display orientation."""
+        from PIL import Image
+
+        h = self._header
+        color = self.ram[h.offset_top:h.offset_top + h.height, h.offset_left:h.offset_left + h.width]
+        color = np.rot90(color, -(h.rotation // 90)).astype(np.uint32)
+        rgb = np.dstack(((color >> 8) & 0xF8, (color >> 3) & 0xFC, (color << 3) & 0xF8)).astype(np.uint8)
+        return Image.fromarray(rgb, 'RGB')
+
+
+def replay(file, output_dir):
+    """Replay a trace against a simulated panel, saving a PNG after every RAM write.
+
+    Returns the number of frames saved.
+
+    """
+    header, records = read_trace(file)
+    if not header.payload:
+        raise ValueError("Trace was recorded without payloads, frames cannot be rebuilt")
+
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    panel = SimulatedPanel(header)
+    frames = 0
+
+    def save():
+        panel.image().save(os.path.join(output_dir, 'frame{:05d}.png'.format(frames)))
+
+    for record in records:
+        if record.is_data:
+            panel.data(record.payload)
+        else:
+            if panel.flush():
+                save()
+                frames += 1
+            panel.command(record.payload)
+
+    if panel.flush():
+        save()
+        frames += 1
+
+    return frames
+
+
+def analyse(file):
+    """Analyse a trace, returning a dict of totals and a list of per-frame breakdowns.
+
+    A frame is a RAM write: a RAMWR command and the pixel data following it. Command
+    overhead is the command and parameter bytes sent since the previous frame.
+
+    """
+    header, records = read_trace(file)
+
+    totals = collections.Counter()
+    frames = []
+    overhead = {'bytes': 0, 'transactions': 0}
+    frame = None
+    last_end = None
+    is_data = None
+
+    for record in records:
+        totals['transactions'] += 1
+        if is_data is not None and record.is_data != is_data:
+            totals['dc_transitions'] += 1
+        is_data = record.is_data
+        totals['bus_us'] += record.duration
+        if last_end is not None:
+            gap = max(record.start - last_end, 0)
+            totals['idle_us'] += gap
+            totals['max_idle_us'] = max(totals['max_idle_us'], gap)
+        last_end = record.start + record.duration
+
+        if not record.is_data:
+            totals['commands'] += 1
+            totals['command_bytes'] += record.length
+            command = bytearray(record.payload)[-1] if record.payload else None
+            frame = None
+            if command == ST7735_RAMWR:
+                frame = {'index': len(frames), 'start_us': record.start, 'pixel_bytes': 0,
+                         'overhead_bytes': overhead['bytes'] + record.length,
+                         'transactions': overhead['transactions'] + 1}
+                frames.append(frame)
+                overhead = {'bytes': 0, 'transactions': 0}
+            else:
+                overhead['bytes'] += record.length
+                overhead['transactions'] += 1
+        elif frame is not None:
+            totals['pixel_bytes'] += record.length
+            frame['pixel_bytes'] += record.length
+            frame['transactions'] += 1
+        else:
+            totals['parameter_bytes'] += record.length
+            overhead['bytes'] += record.length
+            overhead['transactions'] += 1
+
+    totals['frames'] = len(frames)
+    totals['duration_us'] = last_end or 0
+    totals['spi_speed_hz'] = header.spi_speed_hz
+    return dict(totals), frames
+
+
+def report(file, show_frames=False, out=None):
+    """Print a breakdown of a trace, to stdout unless another text file object is given."""
+    out = out or sys.stdout
+    totals, frames = analyse(file)
+    total_bytes = totals.get('command_bytes', 0) + totals.get('parameter_bytes', 0) + totals.get('pixel_bytes', 0)
+    duration = totals['duration_us'] / 1000000.0
+
+    out.write("Duration:          {:10.3f} s\n".format(duration))
+    out.write("SPI speed:         {:10.1f} MHz\n".format(totals['spi_speed_hz'] / 1000000.0))
+    out.write("Transactions:      {:10d}\n".format(totals.get('transactions', 0)))
+    out.write("DC transitions:    {:10d}\n".format(totals.get('dc_transitions', 0)))
+    out.write("Frames:            {:10d}\n".format(totals['frames']))
+    out.write("Pixel bytes:       {:10d}\n".format(totals.get('pixel_bytes', 0)))
+    out.write("Command bytes:     {:10d}\n".format(totals.get('command_bytes', 0)))
+    out.write("Parameter bytes:   {:10d}\n".format(totals.get('parameter_bytes', 0)))
+    if total_bytes:
+        out.write("Command overhead:  {:10.1f} %\n".format(100.0 * (total_bytes - totals.get('pixel_bytes', 0)) / total_bytes))
+    out.write("Time in send():    {:10.3f} s\n".format(totals.get('bus_us', 0) / 1000000.0))
+    out.write("Idle between sends:{:10.3f} s (longest {:.3f} s)\n".format(
+        totals.get('idle_us', 0) / 1000000.0, totals.get('max_idle_us', 0) / 1000000.0))
+    if frames and duration:
+        out.write("Frame rate:        {:10.1f} fps\n".format(len(frames) / duration))
+        out.write("Bytes per frame:   {:10.1f}\n".format(float(total_bytes) / len(frames)))
+
+    if show_frames:
+        out.write("\n{:>6} {:>10} {:>12} {:>14} {:>12}\n".format('frame', 'start s', 'pixel bytes', 'overhead bytes', 'transactions'))
+        for frame in frames:
+            out.write("{index:6d} {start:10.3f} {pixel_bytes:12d} {overhead_bytes:14d} {transactions:12d}\n".format(
+                start=frame['start_us'] / 1000000.0, **frame))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m ST7735.trace', description='Replay and analyse ST7735 SPI traces.')
+    commands = parser.add_subparsers(dest='command')
+
+    report_parser = commands.add_parser('report', help='print a breakdown of bus usage')
+    report_parser.add_argument('trace')
+    report_parser.add_argument('--frames', action='store_true', help='also list every frame')
+
+    replay_parser = commands.add_parser('replay', help='rebuild frames as PNGs')
+    replay_parser.add_argument('trace')
+    replay_parser.add_argument('output_dir')
+
+    args = parser.parse_args(args)
+
+    if args.command == 'report':
+        report(args.trace, args.frames)
+    elif args.command == 'replay':
+        print("Saved {} frames to {}".format(replay(args.trace, args.output_dir), args.output_dir))
+    else:
+        parser.print_help()
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
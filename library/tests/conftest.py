@@ -33,6 +33,11 @@ def spidev():
 def numpy():
     """Mock numpy module."""
     numpy = mock.MagicMock()
+    # Put back the real module afterwards, re-importing it over its own submodules fails
+    original = sys.modules.get('numpy')
     sys.modules['numpy'] = numpy
     yield numpy
-    del sys.modules['numpy']
+    if original is None:
+        del sys.modules['numpy']
+    else:
+        sys.modules['numpy'] = original
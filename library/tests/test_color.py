@@ -0,0 +1,64 @@
+import numpy
+from tools import force_reimport
+
+
+def _sent(spidev):
+    return numpy.frombuffer(bytes(spidev.SpiDev().writebytes2.call_args[0][0]), dtype='>u2')
+
+
+def test_color_correction_lut(GPIO, spidev):
+    force_reimport('ST7735')
+    import ST7735
+    r, g, b = ST7735.color_correction_lut()
+    levels = numpy.arange(256)
+    assert (r[levels] | g[levels] | b[levels] == [ST7735.color565(i, i, i) for i in levels]).all()
+
+    r, g, b = ST7735.color_correction_lut(brightness=0.5, white_balance=(1.0, 1.0, 0.0))
+    assert r[255] | g[255] | b[255] == ST7735.color565(128, 128, 0)
+
+
+def test_display_color_correction(GPIO, spidev):
+    force_reimport('ST7735')
+    from PIL import Image
+    import ST7735
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+    image = Image.new('RGB', (display.width, display.height), (255, 255, 255))
+    dimmed = ST7735.color565(128, 128, 128)
+
+    display.set_color_correction(brightness=0.5)
+    display.display(image)
+    data = spidev.SpiDev().xfer3.call_args[0][0]
+    assert data[:2] == [dimmed >> 8, dimmed & 0xFF]
+
+    display.display(image, scale='fit')
+    assert (_sent(spidev) == dimmed).all()
+
+    display.display(image.convert('P'))
+    assert (_sent(spidev) == dimmed).all()
+
+    display.set_color_correction()
+    display.display(image.convert('P'))
+    assert (_sent(spidev) == ST7735.ST7735_WHITE).all()
+
+
+def test_sprite_and_text_color_correction(GPIO, spidev):
+    force_reimport('ST7735')
+    force_reimport('ST7735.text')
+    import mock
+    from PIL import Image, ImageFont
+    import ST7735
+    from ST7735.text import TextRenderer
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+    display.display_region = mock.MagicMock()
+    dimmed = ST7735.color565(128, 128, 128)
+
+    sprite = ST7735.Sprite.from_image(Image.new('RGB', (4, 4), (255, 255, 255)))
+    text = TextRenderer(display, ImageFont.load_default(), background=(255, 255, 255))
+    assert (sprite.pixels == ST7735.ST7735_WHITE).all()
+
+    display.set_color_correction(brightness=0.5)
+    display.blit(sprite, 0, 0)
+    assert (display.display_region.call_args[0][0] == dimmed).all()
+
+    text.draw(' ', 0, 0)
+    assert (display.display_region.call_args[0][0] == dimmed).all()
@@ -0,0 +1,123 @@
+import mock
+import numpy
+from tools import force_reimport
+
+
+def _compositor():
+    import ST7735
+    from ST7735.compositor import Compositor
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+    display.display_region = mock.MagicMock()
+    return display, Compositor(display, background=(0, 0, 255))
+
+
+def test_merge_rects(GPIO, spidev):
+    force_reimport('ST7735.compositor')
+    from ST7735.compositor import merge_rects
+    assert merge_rects([(0, 0, 10, 10), (5, 5, 15, 15), (50, 50, 60, 60)]) == [(0, 0, 15, 15), (50, 50, 60, 60)]
+    assert merge_rects([(0, 0, 2, 2), (10, 0, 12, 2), (1, 0, 11, 1)]) == [(0, 0, 12, 2)]
+
+
+def test_compositor_dirty_regions(GPIO, spidev):
+    force_reimport('ST7735.compositor')
+    import ST7735
+    from ST7735.compositor import Layer
+    display, compositor = _compositor()
+
+    widget = compositor.add_layer(Layer(10, 10, x=20, y=20))
+    widget.fill((255, 0, 0))
+    assert compositor.update() == [(0, 0, display.width, display.height)]
+    region, x, y = display.display_region.call_args[0]
+    assert region[20, 20] == ST7735.ST7735_RED and region[0, 0] == ST7735.ST7735_BLUE
+
+    assert compositor.update() == []
+
+    widget.draw(numpy.full((2, 2), ST7735.ST7735_GREEN, dtype=numpy.uint16), 4, 4)
+    assert compositor.update() == [(24, 24, 26, 26)]
+
+    widget.move(25, 20)
+    assert compositor.update() == [(20, 20, 35, 30)]
+    region, x, y = display.display_region.call_args[0]
+    assert (region[:, :5] == ST7735.ST7735_BLUE).all()
+
+    widget.hide()
+    compositor.update()
+    region, x, y = display.display_region.call_args[0]
+    assert (region == ST7735.ST7735_BLUE).all()
+
+
+def test_compositor_alpha(GPIO, spidev):
+    force_reimport('ST7735.compositor')
+    from PIL import Image
+    import ST7735
+    from ST7735.compositor import Layer
+    display, compositor = _compositor()
+
+    mask = compositor.add_layer(Layer(4, 1, alpha='1'))
+    image = Image.new('RGBA', (4, 1), (255, 255, 255, 255))
+    image.putpixel((0, 0), (255, 255, 255, 0))
+    mask.draw(image)
+
+    overlay = compositor.add_layer(Layer(4, 1, y=1, alpha='L'))
+    overlay.fill((255, 0, 0), opacity=128)
+
+    region = compositor.compose((0, 0, 4, 2))
+    assert region[0].tolist() == [ST7735.ST7735_BLUE] + [ST7735.ST7735_WHITE] * 3
+    assert region[1, 0] == (16 << 11) | 15
+
+
+def test_compositor_color_correction(GPIO, spidev):
+    force_reimport('ST7735.compositor')
+    from PIL import Image
+    import ST7735
+    from ST7735.compositor import Layer
+    display, compositor = _compositor()
+    display.set_color_correction(brightness=0.5)
+
+    layer = compositor.add_layer(Layer(4, 4))
+    layer.fill((255, 255, 255))
+    layer.draw(Image.new('RGB', (2, 2), (255, 0, 0)))
+    compositor.update()
+    region, x, y = display.display_region.call_args[0]
+    assert region[0, 0] == ST7735.color565(128, 0, 0)
+    assert region[3, 3] == ST7735.color565(128, 128, 128)
+    assert region[10, 10] == ST7735.color565(0, 0, 128)
+
+
+def test_compositor_correction_change(GPIO, spidev):
+    force_reimport('ST7735.compositor')
+    import ST7735
+    from ST7735.compositor import Layer
+    display, compositor = _compositor()
+
+    # Drawn before the layer is added or the correction is set
+    layer = Layer(4, 4)
+    layer.fill((255, 255, 255))
+    compositor.add_layer(layer)
+    compositor.update()
+
+    display.set_color_correction(brightness=0.5)
+    assert compositor.update() == [(0, 0, display.width, display.height)]
+    region, x, y = display.display_region.call_args[0]
+    assert region[0, 0] == ST7735.color565(128, 128, 128)
+    assert region[10, 10] == ST7735.color565(0, 0, 128)
+
+
+def test_layer_draw_clipped(GPIO, spidev):
+    force_reimport('ST7735.compositor')
+    from PIL import Image
+    import ST7735
+    from ST7735.compositor import Layer
+    layer = Layer(10, 10, alpha='L')
+    layer._dirty = []
+
+    layer.draw(Image.new('RGBA', (20, 20), (255, 0, 0, 255)), -2, -2)
+    assert (layer.pixels == ST7735.ST7735_RED).all() and (layer.alpha == 255).all()
+    assert layer._dirty == [(0, 0, 10, 10)]
+
+    layer.draw(numpy.full((4, 4), ST7735.ST7735_GREEN, dtype=numpy.uint16), 8, -2)
+    assert (layer.pixels[:2, 8:] == ST7735.ST7735_GREEN).all()
+    assert layer._dirty[-1] == (8, 0, 10, 2)
+
+    layer.draw(numpy.zeros((4, 4), dtype=numpy.uint16), 20, 20)
+    assert len(layer._dirty) == 2
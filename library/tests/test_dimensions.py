@@ -15,3 +15,28 @@ def test_128_64_90(GPIO, spidev, numpy):
     display = ST7735.ST7735(port=0, cs=0, dc=24, width=128, height=64, rotation=90)
     assert display.width == 64
     assert display.height == 128
+
+
+def test_profile_144(GPIO, spidev, numpy):
+    force_reimport('ST7735')
+    import ST7735
+    display = ST7735.ST7735(port=0, cs=0, dc=24, profile='1.44-128x128')
+    assert display.width == 128
+    assert display.height == 128
+    assert (display._offset_left, display._offset_top) == (2, 3)
+
+
+def test_profile_override(GPIO, spidev, numpy):
+    force_reimport('ST7735')
+    import ST7735
+    display = ST7735.ST7735(port=0, cs=0, dc=24, profile='1.8-128x160-black', rotation=90)
+    assert display.width == 160
+    assert display.height == 128
+
+
+def test_profile_unknown(GPIO, spidev, numpy):
+    import pytest
+    force_reimport('ST7735')
+    import ST7735
+    with pytest.raises(ValueError):
+        ST7735.ST7735(port=0, cs=0, dc=24, profile='2.0-240x320')
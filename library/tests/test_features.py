@@ -23,3 +23,37 @@ def test_image_to_data(GPIO, spidev, numpy):
     numpy.dstack().flatten().tolist.return_value = []
     import ST7735
     assert ST7735.image_to_data(mock.MagicMock()) == []
+
+
+def test_display_palette_image(GPIO, spidev):
+    force_reimport('ST7735')
+    from PIL import Image
+    import ST7735
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+    image = Image.new('RGB', (display.width, display.height), (255, 0, 0))
+    image.paste((0, 0, 255), (0, 0, 10, 20))
+
+    display.display(image.convert('P'))
+    expected = bytearray(ST7735.image_to_rgb565(image, display._rotation).astype('>u2').tobytes())
+    spidev.SpiDev().writebytes2.assert_called_with(expected)
+
+
+def test_display_palette_indexes(GPIO, spidev):
+    force_reimport('ST7735')
+    import numpy
+    import ST7735
+    display = ST7735.ST7735(port=0, cs=0, dc=24, rotation=0)
+    indexes = numpy.zeros((display.height, display.width), dtype=numpy.uint8)
+    indexes[0, 0] = 1
+
+    display.display(indexes, palette=[(0, 0, 0), (255, 255, 255)])
+    data = spidev.SpiDev().writebytes2.call_args[0][0]
+    assert data[:4] == b'\xff\xff\x00\x00'
+    lut = display._palette_lut
+
+    display.display(indexes, palette=[(0, 0, 0), (255, 255, 255)])
+    assert display._palette_lut is lut
+
+    display.display(indexes, palette=ST7735.palette_to_lut([(0, 0, 0), (255, 0, 0)]))
+    data = spidev.SpiDev().writebytes2.call_args[0][0]
+    assert data[:4] == b'\xf8\x00\x00\x00'
@@ -0,0 +1,61 @@
+import struct
+import pytest
+from tools import force_reimport
+
+
+def _gif(tmpdir, size, colours):
+    from PIL import Image
+    frames = [Image.new('RGB', size, colour) for colour in colours]
+    path = str(tmpdir.join('test.gif'))
+    frames[0].save(path, save_all=True, append_images=frames[1:])
+    return path
+
+
+def test_pipeline_frames_in_order(GPIO, spidev, tmpdir):
+    pytest.importorskip('multiprocessing.shared_memory')
+    force_reimport('ST7735.pipeline')
+    import ST7735
+    from ST7735.pipeline import FramePipeline, image_frames
+
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+    colours = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 255), (0, 0, 0)]
+    path = _gif(tmpdir, (display.width, display.height), colours)
+
+    with FramePipeline(display, processes=2, lookahead=3) as pipeline:
+        frames = [frame.tobytes() for frame in pipeline.frames(image_frames(path))]
+
+    assert len(frames) == len(colours)
+    for frame, (r, g, b) in zip(frames, colours):
+        colour = ST7735.color565(r, g, b)
+        assert frame == struct.pack('>H', colour) * (display.width * display.height)
+
+
+def test_pipeline_play(GPIO, spidev, tmpdir):
+    pytest.importorskip('multiprocessing.shared_memory')
+    force_reimport('ST7735.pipeline')
+    import ST7735
+    from ST7735.pipeline import FramePipeline, image_frames
+
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+    path = _gif(tmpdir, (16, 8), [(255, 0, 0), (0, 255, 0)])
+
+    # Frames are views of the shared ring that are released once sent, so record their sizes as they go
+    sizes = []
+    spidev.SpiDev().writebytes2.side_effect = lambda data: sizes.append(len(data))
+
+    with FramePipeline(display, processes=1) as pipeline:
+        pipeline.play(image_frames(path) * 2)
+
+    assert sizes.count(display.width * display.height * 2) == 4
+
+
+def test_pipeline_requires_shared_memory(GPIO, spidev, monkeypatch):
+    force_reimport('ST7735.pipeline')
+    import ST7735
+    import ST7735.pipeline
+
+    monkeypatch.setattr(ST7735.pipeline, 'shared_memory', None)
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+
+    with pytest.raises(RuntimeError):
+        ST7735.pipeline.FramePipeline(display)
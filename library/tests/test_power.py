@@ -0,0 +1,71 @@
+import time
+import mock
+from tools import force_reimport
+
+
+def test_sleep_wake(GPIO, spidev):
+    force_reimport('ST7735')
+    import ST7735
+    display = ST7735.ST7735(port=0, cs=0, dc=24, backlight=4)
+    display.command = mock.MagicMock()
+
+    display.sleep()
+    assert display.sleeping
+    display.command.assert_has_calls([mock.call(ST7735.ST7735_DISPOFF), mock.call(ST7735.ST7735_SLPIN)])
+    GPIO.output.assert_called_with(4, GPIO.LOW)
+
+    display.command.reset_mock()
+    display.wake()
+    assert not display.sleeping
+    display.command.assert_has_calls([mock.call(ST7735.ST7735_SLPOUT), mock.call(ST7735.ST7735_DISPON)])
+    GPIO.output.assert_called_with(4, GPIO.HIGH)
+
+
+def test_draw_wakes(GPIO, spidev):
+    force_reimport('ST7735')
+    import numpy
+    import ST7735
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+    display.sleep()
+    display.wake = mock.MagicMock(side_effect=display.wake)
+    display.display_region(numpy.zeros((2, 2), dtype=numpy.uint16))
+    display.wake.assert_called_once_with()
+    assert not display.sleeping
+
+
+def test_idle_timeout(GPIO, spidev):
+    force_reimport('ST7735')
+    import numpy
+    import ST7735
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+    display.set_idle_timeout(0.05)
+    time.sleep(0.2)
+    assert display.sleeping
+
+    display.display_region(numpy.zeros((2, 2), dtype=numpy.uint16))
+    assert not display.sleeping
+
+    thread = display._idle_thread
+    display.set_idle_timeout(None)
+    thread.join(1)
+    assert not thread.is_alive()
+    time.sleep(0.1)
+    assert not display.sleeping
+
+    display.set_idle_timeout(0.05)
+    time.sleep(0.2)
+    assert display.sleeping
+
+
+def test_wake_restores_backlight(GPIO, spidev):
+    force_reimport('ST7735')
+    import numpy
+    import ST7735
+    display = ST7735.ST7735(port=0, cs=0, dc=24, backlight=4)
+    display.set_backlight(GPIO.LOW)
+    display.sleep()
+
+    GPIO.output.reset_mock()
+    display.display_region(numpy.zeros((2, 2), dtype=numpy.uint16))
+    assert not display.sleeping
+    assert [call for call in GPIO.output.call_args_list if call[0][0] == 4] == [mock.call(4, GPIO.LOW)]
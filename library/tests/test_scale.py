@@ -0,0 +1,72 @@
+import io
+import numpy
+from tools import force_reimport
+
+
+def _sent(spidev):
+    return numpy.frombuffer(bytes(spidev.SpiDev().writebytes2.call_args[0][0]), dtype='>u2')
+
+
+def test_display_scale_stretch(GPIO, spidev):
+    force_reimport('ST7735')
+    from PIL import Image
+    import ST7735
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+    image = Image.new('RGB', (display.width * 2, display.height * 2), (255, 0, 0))
+    image.paste((0, 0, 255), (0, 0, display.width, display.height * 2))
+
+    display.display(image, scale='stretch')
+    expected = image.resize((display.width, display.height), Image.NEAREST)
+    assert _sent(spidev).tolist() == ST7735.image_to_rgb565(expected, display._rotation).flatten().tolist()
+
+    display.display(image, scale='stretch', resample='bilinear')
+    assert set(_sent(spidev).tolist()) <= {ST7735.ST7735_RED, ST7735.ST7735_BLUE, ST7735.color565(127, 0, 127), ST7735.color565(128, 0, 128)}
+
+
+def test_display_scale_fit(GPIO, spidev):
+    force_reimport('ST7735')
+    from PIL import Image
+    import ST7735
+    display = ST7735.ST7735(port=0, cs=0, dc=24, rotation=0)
+    # Square source on a portrait display leaves black bars top and bottom
+    display.display(Image.new('RGB', (40, 40), (255, 255, 255)), scale='fit')
+    frame = _sent(spidev).reshape(display.height, display.width)
+    bar = (display.height - display.width) // 2
+    assert (frame[:bar] == 0).all() and (frame[-bar:] == 0).all()
+    assert (frame[bar:-bar] == ST7735.ST7735_WHITE).all()
+    assert len(display._resample_maps) == 1
+
+    display.display(Image.new('RGB', (40, 40), (255, 0, 0)), scale='fill')
+    assert (_sent(spidev) == ST7735.ST7735_RED).all()
+    assert len(display._resample_maps) == 2
+
+
+def test_display_scale_palette_and_jpeg(GPIO, spidev):
+    force_reimport('ST7735')
+    from PIL import Image
+    import ST7735
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+    display.display(Image.new('RGB', (640, 480), (0, 255, 0)).convert('P'), scale='fill', resample='bilinear')
+    assert (_sent(spidev) == ST7735.ST7735_GREEN).all()
+
+    jpeg = io.BytesIO()
+    Image.new('RGB', (1280, 960), (255, 255, 255)).save(jpeg, 'JPEG')
+    # The caller's image is left alone unless draft decoding is asked for
+    image = Image.open(jpeg)
+    display.display(image, scale='fit')
+    assert image.size == (1280, 960)
+
+    jpeg.seek(0)
+    image = Image.open(jpeg)
+    display.display(image, scale='fit', draft=True)
+    assert image.size == (160, 120)
+
+
+def test_display_scale_bilinear_keeps_brightness(GPIO, spidev):
+    force_reimport('ST7735')
+    from PIL import Image
+    import ST7735
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+    # Uneven scale factors, where flooring each weight separately lost up to 2/256 of every pixel
+    display.display(Image.new('RGB', (97, 53), (8, 4, 8)), scale='stretch', resample='bilinear')
+    assert (_sent(spidev) == ST7735.color565(8, 4, 8)).all()
@@ -0,0 +1,96 @@
+import mock
+import numpy
+from tools import force_reimport
+
+
+def _scheduler(budget):
+    import ST7735
+    from ST7735.scheduler import UpdateScheduler
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+    display.display_region = mock.MagicMock()
+    return display, UpdateScheduler(display, budget=budget)
+
+
+def _regions(display):
+    return [(call[0][1], call[0][2], call[0][0].shape) for call in display.display_region.call_args_list]
+
+
+def test_scheduler_default_budget(GPIO, spidev):
+    force_reimport('ST7735.scheduler')
+    import ST7735
+    from ST7735.scheduler import UpdateScheduler
+    display = ST7735.ST7735(port=0, cs=0, dc=24, spi_speed_hz=4800000)
+    assert UpdateScheduler(display, tick_hz=60).budget == 10000
+
+
+def test_scheduler_priority_and_split(GPIO, spidev):
+    force_reimport('ST7735.scheduler')
+    display, scheduler = _scheduler(budget=1000)
+    big = numpy.ones((40, 40), dtype=numpy.uint16)
+    small = numpy.full((4, 4), 2, dtype=numpy.uint16)
+
+    scheduler.submit(big, 0, 0)
+    scheduler.submit(small, 100, 50, priority=10)
+
+    # The small update goes first, then as many rows of the big one as fit
+    sent = scheduler.tick()
+    assert _regions(display) == [(100, 50, (4, 4)), (0, 0, (11, 40))]
+    assert sent == 11 + 32 + 11 + 11 * 80
+    assert scheduler.pending == 1
+
+    display.display_region.reset_mock()
+    while scheduler.pending:
+        scheduler.tick()
+    assert sum(shape[0] for x, y, shape in _regions(display)) == 40 - 11
+
+
+def test_scheduler_merge_and_deadline(GPIO, spidev):
+    force_reimport('ST7735.scheduler')
+    display, scheduler = _scheduler(budget=100000)
+    scheduler.submit(numpy.ones((10, 10), dtype=numpy.uint16), 0, 0, priority=1)
+    scheduler.submit(numpy.full((10, 10), 3, dtype=numpy.uint16), 5, 5, priority=1, deadline=1)
+    assert scheduler.pending == 1
+
+    scheduler.submit(numpy.ones((2, 2), dtype=numpy.uint16), 100, 0, priority=5)
+    scheduler.submit(numpy.ones((2, 2), dtype=numpy.uint16), 120, 0, priority=9, deadline=-1)
+    scheduler.tick()
+    assert [region[:2] for region in _regions(display)] == [(120, 0), (100, 0), (0, 0)]
+    region = display.display_region.call_args_list[2][0][0]
+    assert region.shape == (15, 15) and region[0, 0] == 1 and region[14, 14] == 3 and region[0, 14] == 0
+
+
+def test_scheduler_keeps_priorities_apart(GPIO, spidev):
+    force_reimport('ST7735.scheduler')
+    display, scheduler = _scheduler(budget=2000)
+    scheduler.submit(numpy.ones((display.height, display.width), dtype=numpy.uint16))
+    scheduler.submit(numpy.full((4, 4), 2, dtype=numpy.uint16), 10, 40, priority=10)
+    assert scheduler.pending == 2
+
+    # The indicator goes out on the first tick rather than waiting behind the redraw
+    scheduler.tick()
+    assert _regions(display)[0] == (10, 40, (4, 4))
+    assert display.display_region.call_args_list[0][0][0][0, 0] == 2
+
+
+def test_scheduler_row_over_budget(GPIO, spidev):
+    force_reimport('ST7735.scheduler')
+    display, scheduler = _scheduler(budget=300)
+    scheduler.submit(numpy.ones((2, display.width), dtype=numpy.uint16), 0, 0)
+
+    # A 160 pixel row is 320 bytes, so rows are sent in column strips
+    assert scheduler.tick() > 0
+    assert _regions(display) == [(0, 0, (1, 144))]
+
+    ticks = 1
+    while scheduler.pending:
+        assert scheduler.tick() > 0
+        ticks += 1
+    assert ticks == 3
+    assert sum(shape[0] * shape[1] for x, y, shape in _regions(display)) == 2 * display.width
+
+    # Even a budget smaller than the window overhead still sends a pixel a tick
+    display, scheduler = _scheduler(budget=1)
+    scheduler.submit(numpy.ones((1, 2), dtype=numpy.uint16), 0, 0)
+    scheduler.tick()
+    scheduler.tick()
+    assert scheduler.pending == 0
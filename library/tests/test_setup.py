@@ -45,3 +45,20 @@ def test_setup_with_reset(GPIO, spidev, numpy):
     display = ST7735.ST7735(port=0, cs=0, dc=24, rst=4)
     GPIO.setup.assert_called_with(4, GPIO.OUT)
     del display
+
+
+def test_setup_profile_blobs(GPIO, spidev, numpy):
+    force_reimport('ST7735')
+    import ST7735
+    display = ST7735.ST7735(port=0, cs=0, dc=24, profile='1.8-128x160-green')
+
+    # Every command's parameters are sent in one write
+    spidev.SpiDev().writebytes2.assert_any_call(b'\xa2\x02\x84')
+    spidev.SpiDev().writebytes2.assert_any_call(b'\x00\x02\x00\x81')
+
+    spidev.SpiDev().writebytes2.reset_mock()
+    display.set_window()
+    spidev.SpiDev().writebytes2.assert_has_calls([
+        mock.call(b'\x00\x02\x00\x81'),
+        mock.call(b'\x00\x01\x00\xa0')
+    ])
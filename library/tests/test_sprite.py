@@ -0,0 +1,67 @@
+import mock
+import numpy
+from tools import force_reimport
+
+
+def _display(rotation=0):
+    import ST7735
+    display = ST7735.ST7735(port=0, cs=0, dc=24, rotation=rotation)
+    display.display_region = mock.MagicMock()
+    return display
+
+
+def test_sprite_from_image(GPIO, spidev):
+    force_reimport('ST7735')
+    from PIL import Image
+    import ST7735
+    image = Image.new('RGBA', (4, 3), (255, 0, 0, 255))
+    image.putpixel((0, 0), (0, 0, 0, 0))
+    sprite = ST7735.Sprite.from_image(image)
+    assert (sprite.width, sprite.height) == (4, 3)
+    assert sprite.pixels[1, 1] == ST7735.ST7735_RED
+    assert not sprite.mask[0, 0] and sprite.mask[1, 1]
+    assert ST7735.Sprite.from_image(image.convert('RGB')).mask is None
+
+
+def test_blit_restores_background(GPIO, spidev):
+    force_reimport('ST7735')
+    from PIL import Image
+    import ST7735
+    display = _display()
+    display.set_background(Image.new('RGB', (display.width, display.height), (0, 0, 255)))
+    region, = display.display_region.call_args[0]
+    assert region.shape == (display.height, display.width)
+    sprite = ST7735.Sprite(numpy.full((4, 4), ST7735.ST7735_RED, dtype=numpy.uint16))
+
+    display.blit(sprite, 10, 10)
+    region, x, y = display.display_region.call_args[0]
+    assert (x, y) == (10, 10) and region.shape == (4, 4)
+
+    # Overlapping move: one rectangle covering old and new positions
+    display.blit(sprite, 12, 10)
+    region, x, y = display.display_region.call_args[0]
+    assert (x, y) == (10, 10) and region.shape == (4, 6)
+    assert (region[:, :2] == ST7735.ST7735_BLUE).all()
+    assert (region[:, 2:] == ST7735.ST7735_RED).all()
+
+    # Distant move: old and new rectangles sent separately
+    display.display_region.reset_mock()
+    display.blit(sprite, 40, 40)
+    assert [c[0][1:] for c in display.display_region.call_args_list] == [(12, 10), (40, 40)]
+
+    display.erase(sprite)
+    region, x, y = display.display_region.call_args[0]
+    assert (x, y) == (40, 40) and (region == ST7735.ST7735_BLUE).all()
+
+
+def test_blit_mask(GPIO, spidev):
+    force_reimport('ST7735')
+    import ST7735
+    display = _display()
+    mask = numpy.array([[True, False], [False, True]])
+    sprite = ST7735.Sprite(numpy.full((2, 2), ST7735.ST7735_WHITE, dtype=numpy.uint16), mask)
+
+    display.blit(sprite, -1, 0)
+    region, x, y = display.display_region.call_args[0]
+    assert (x, y) == (0, 0)
+    assert region.tolist() == [[ST7735.ST7735_BLACK], [ST7735.ST7735_WHITE]]
@@ -0,0 +1,77 @@
+import io
+import struct
+from tools import force_reimport
+
+
+def test_read_frames(GPIO, spidev):
+    force_reimport('ST7735.stream')
+    from ST7735.stream import read_frames
+    frames = [frame.tobytes() for frame in read_frames(io.BytesIO(b'aabbccd'), 2)]
+    assert frames == [b'aa', b'bb', b'cc']
+
+
+def test_stream_rgb24(GPIO, spidev):
+    force_reimport('ST7735.stream')
+    import ST7735
+    from ST7735.stream import RawVideoStream
+    display = ST7735.ST7735(port=0, cs=0, dc=24, rotation=0)
+    pixels = display.width * display.height
+    raw = io.BytesIO(b'\xff\x00\x00' * pixels + b'\x00\x00\xff' * pixels)
+
+    # The output buffer is reused, so take a copy of each frame as it is sent
+    sent = []
+    spidev.SpiDev().writebytes2.side_effect = lambda data: len(data) == pixels * 2 and sent.append(bytes(bytearray(data)))
+    RawVideoStream(display, raw, pixel_format='RGB24').play()
+
+    assert sent == [
+        struct.pack('>H', ST7735.ST7735_RED) * pixels,
+        struct.pack('>H', ST7735.ST7735_BLUE) * pixels]
+
+
+def test_stream_rgb565le_rotated(GPIO, spidev):
+    force_reimport('ST7735.stream')
+    import ST7735
+    from ST7735.stream import RawVideoStream
+    display = ST7735.ST7735(port=0, cs=0, dc=24, rotation=90)
+    stream = RawVideoStream(display, io.BytesIO(), pixel_format='RGB565LE')
+    # First row of the landscape frame red, the rest black
+    frame = struct.pack('<H', ST7735.ST7735_RED) * display.width + b'\x00\x00' * display.width * (display.height - 1)
+    out = bytes(bytearray(stream.convert(frame)))
+    assert len(out) == len(frame)
+    assert out.count(struct.pack('>H', ST7735.ST7735_RED)) == display.width
+
+
+def test_stream_latest(GPIO, spidev):
+    force_reimport('ST7735.stream')
+    import ST7735
+    from ST7735.stream import RawVideoStream
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+    size = display.width * display.height * 2
+    stream = RawVideoStream(display, io.BytesIO(b'\x00' * size * 5), backpressure='latest')
+    frames = list(frame.tobytes() for frame in stream.frames())
+    assert len(frames) + stream.dropped == 5
+    assert len(frames) >= 1
+
+
+def test_stream_latest_close_stops_reader(GPIO, spidev):
+    force_reimport('ST7735.stream')
+    import time
+    import ST7735
+    from ST7735.stream import RawVideoStream
+
+    class Endless(object):
+        reads = 0
+
+        def readinto(self, buf):
+            Endless.reads += 1
+            return len(buf)
+
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+    frames = RawVideoStream(display, Endless(), backpressure='latest').frames()
+    next(frames)
+    frames.close()
+
+    time.sleep(0.05)
+    reads = Endless.reads
+    time.sleep(0.05)
+    assert Endless.reads == reads
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import mock
+import numpy
+from tools import force_reimport
+
+
+def test_display_region_rotations(GPIO, spidev):
+    force_reimport('ST7735')
+    import ST7735
+    for rotation in (0, 90, 180, 270):
+        display = ST7735.ST7735(port=0, cs=0, dc=24, rotation=rotation)
+        full = numpy.arange(display.width * display.height, dtype=numpy.uint16).reshape(display.height, display.width)
+        ram = numpy.rot90(full, rotation // 90)
+
+        display.set_window = mock.MagicMock()
+        display.data = mock.MagicMock()
+        display.display_region(full[3:10, 5:9], 5, 3)
+
+        x0, y0, x1, y1 = display.set_window.call_args[0]
+        expected = ram[y0:y1 + 1, x0:x1 + 1].astype('>u2').tobytes()
+        assert display.data.call_args[0][0] == expected
+
+
+def test_display_region_clipped(GPIO, spidev):
+    force_reimport('ST7735')
+    import ST7735
+    display = ST7735.ST7735(port=0, cs=0, dc=24, rotation=0)
+    display.set_window = mock.MagicMock()
+    display.data = mock.MagicMock()
+
+    display.display_region(numpy.zeros((10, 10), dtype=numpy.uint16), -5, -2)
+    display.set_window.assert_called_with(0, 0, 4, 7)
+
+    display.set_window.reset_mock()
+    display.display_region(numpy.zeros((10, 10), dtype=numpy.uint16), display.width, 0)
+    display.set_window.assert_not_called()
+
+
+def test_glyph_atlas(GPIO, spidev):
+    force_reimport('ST7735.text')
+    from PIL import ImageFont
+    from ST7735.text import glyph_atlas
+    font = ImageFont.load_default()
+    atlas = glyph_atlas(font, (255, 0, 0))
+
+    assert glyph_atlas(font, (255, 0, 0)) is atlas
+    assert glyph_atlas(font, (0, 255, 0)) is not atlas
+
+    pixels = atlas.render('Hi!')
+    assert pixels.shape == (atlas.height, atlas.text_width('Hi!'))
+    assert set(numpy.unique(pixels)) <= set(numpy.unique(atlas.pixels))
+    assert atlas.render('Hi', width=50).shape == (atlas.height, 50)
+    assert atlas.render(u'é').shape[1] == atlas.text_width(u'é')
+
+
+def test_glyph_atlas_eviction(GPIO, spidev):
+    force_reimport('ST7735.text')
+    from PIL import ImageFont
+    import ST7735.text
+    font = ImageFont.load_default()
+    first = ST7735.text.glyph_atlas(font, (0, 0, 0))
+    for colour in range(ST7735.text.ATLAS_CACHE_SIZE):
+        ST7735.text.glyph_atlas(font, (colour, 255, 255))
+    assert ST7735.text.glyph_atlas(font, (0, 0, 0)) is not first
+
+
+def test_text_renderer(GPIO, spidev):
+    force_reimport('ST7735.text')
+    from PIL import ImageFont
+    import ST7735
+    from ST7735.text import TextRenderer
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+    display.display_region = mock.MagicMock()
+    text = TextRenderer(display, ImageFont.load_default())
+
+    assert text.draw('42', 10, 20, width=30) == (30, text.height)
+    pixels, x, y = display.display_region.call_args[0]
+    assert (x, y) == (10, 20)
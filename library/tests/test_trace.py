@@ -0,0 +1,132 @@
+import io
+import sys
+import time
+import mock
+import pytest
+from tools import force_reimport
+
+
+def _trace(display, frames, payload=True):
+    from PIL import Image
+    trace = io.BytesIO()
+    trace.close = lambda: None
+    display.start_trace(trace, payload)
+    for colour in frames:
+        display.display(Image.new('RGB', (display.width, display.height), colour))
+    display.display_region(display._transfer()[:4, :8], 2, 3)
+    display.stop_trace()
+    trace.seek(0)
+    return trace
+
+
+def test_trace_replay(GPIO, spidev, tmpdir):
+    force_reimport('ST7735.trace')
+    from PIL import Image
+    import ST7735
+    from ST7735.trace import replay
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+    trace = _trace(display, [(255, 0, 0), (0, 0, 255)])
+
+    assert replay(trace, str(tmpdir)) == 3
+    frame = Image.open(str(tmpdir.join('frame00001.png')))
+    assert frame.size == (display.width, display.height)
+    assert frame.getpixel((0, 0)) == (0, 0, 248)
+
+
+def test_trace_analyse(GPIO, spidev):
+    force_reimport('ST7735.trace')
+    import ST7735
+    from ST7735.trace import analyse, report, read_trace
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+    trace = _trace(display, [(255, 0, 0), (0, 0, 255)], payload=False)
+
+    header, records = read_trace(trace)
+    assert (header.width, header.height, header.rotation) == (80, 160, 90)
+    assert not header.payload
+
+    trace.seek(0)
+    totals, frames = analyse(trace)
+    assert totals['frames'] == 3
+    assert [frame['pixel_bytes'] for frame in frames] == [80 * 160 * 2, 80 * 160 * 2, 4 * 8 * 2]
+    assert frames[0]['overhead_bytes'] == 11
+    assert totals['dc_transitions'] > 0
+
+    trace.seek(0)
+    out = mock.Mock()
+    report(trace, show_frames=True, out=out)
+    assert any('Frames:' in call[0][0] for call in out.write.call_args_list)
+
+
+def test_trace_cli(GPIO, spidev, tmpdir, capsys):
+    force_reimport('ST7735.trace')
+    import ST7735
+    from ST7735.trace import main
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+    path = str(tmpdir.join('ui.trace'))
+    display.start_trace(path)
+    display.display_region(display._transfer(), 0, 0)
+    display.stop_trace()
+
+    assert main(['report', path, '--frames']) == 0
+    assert main(['replay', path, str(tmpdir.join('frames'))]) == 0
+    assert 'Saved 1 frames' in capsys.readouterr().out
+
+
+def test_trace_without_payload_does_not_copy(GPIO, spidev, monkeypatch):
+    force_reimport('ST7735.trace')
+    import ST7735
+    import ST7735.trace
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+    copied = []
+    to_bytes = ST7735.trace._to_bytes
+    monkeypatch.setattr(ST7735.trace, '_to_bytes', lambda data: copied.append(len(data)) or to_bytes(data))
+
+    trace = _trace(display, [(255, 0, 0)], payload=False)
+
+    # Only command bytes are copied, pixel and parameter data are just measured
+    assert copied and max(copied) == 1
+    totals, frames = ST7735.trace.analyse(trace)
+    assert frames[0]['pixel_bytes'] == 80 * 160 * 2
+
+
+def test_read_trace_closes_file(GPIO, spidev, tmpdir, monkeypatch):
+    force_reimport('ST7735.trace')
+    import ST7735
+    import ST7735.trace
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+    path = str(tmpdir.join('ui.trace'))
+    display.start_trace(path)
+    display.display_region(display._transfer(), 0, 0)
+    display.stop_trace()
+
+    opened = []
+    monkeypatch.setattr(ST7735.trace, 'open', lambda *args: opened.append(io.open(*args)) or opened[-1], raising=False)
+
+    header, records = ST7735.trace.read_trace(path)
+    assert len(list(records)) > 0
+    assert opened[0].closed
+
+
+def test_trace_cli_without_hardware(tmpdir, capsys, monkeypatch):
+    # Traces are analysed off the Pi, where spidev and RPi.GPIO aren't installed
+    for module in ('spidev', 'RPi', 'RPi.GPIO'):
+        monkeypatch.setitem(sys.modules, module, None)
+    force_reimport('ST7735.trace')
+    import ST7735
+    from ST7735.trace import TraceWriter, main
+
+    display = mock.Mock(_width=2, _height=1, _offset_left=0, _offset_top=0, _rotation=0)
+    display._spi.max_speed_hz = 4000000
+    path = str(tmpdir.join('ui.trace'))
+    writer = TraceWriter(path, display)
+    for is_data, data in ((False, [ST7735.ST7735_RAMWR]), (True, b'\xf8\x00\x07\xe0')):
+        now = time.time()
+        writer.record(is_data, data, now, now)
+    writer.close()
+
+    assert main(['report', path]) == 0
+    assert main(['replay', path, str(tmpdir.join('frames'))]) == 0
+    assert 'Saved 1 frames' in capsys.readouterr().out
+
+    with pytest.raises(ImportError):
+        ST7735.ST7735(port=0, cs=0, dc=24)
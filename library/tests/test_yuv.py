@@ -0,0 +1,52 @@
+import numpy
+import pytest
+from tools import force_reimport
+
+
+def _yuv(width, height, y, u, v, pixel_format):
+    luma = bytearray([y]) * (width * height)
+    if pixel_format == 'NV12':
+        return luma + bytearray([u, v]) * (width * height // 4)
+    return luma + bytearray([u]) * (width * height // 4) + bytearray([v]) * (width * height // 4)
+
+
+@pytest.mark.parametrize('pixel_format', ['YUV420', 'NV12'])
+def test_display_yuv(GPIO, spidev, pixel_format):
+    force_reimport('ST7735')
+    import ST7735
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+
+    for (y, u, v), colour in [
+            ((16, 128, 128), ST7735.ST7735_BLACK),
+            ((235, 128, 128), ST7735.ST7735_WHITE),
+            ((82, 90, 240), ST7735.color565(255, 0, 0))]:
+        display.display_yuv(_yuv(320, 240, y, u, v, pixel_format), (320, 240), pixel_format)
+        sent = numpy.frombuffer(bytes(spidev.SpiDev().writebytes2.call_args[0][0]), dtype='>u2')
+        assert len(sent) == display.width * display.height
+        assert (sent == colour).all()
+
+
+def test_display_yuv_stride(GPIO, spidev):
+    force_reimport('ST7735')
+    import ST7735
+    display = ST7735.ST7735(port=0, cs=0, dc=24, rotation=0)
+    # Left half of each row white, padding bytes (and right half) black
+    width, height, stride = 16, 32, 24
+    luma = numpy.full((height, stride), 16, dtype=numpy.uint8)
+    luma[:, :width // 2] = 235
+    chroma = numpy.full(stride * height // 2, 128, dtype=numpy.uint8)
+    frame = luma.tobytes() + chroma.tobytes()
+
+    display.display_yuv(frame, (width, height), 'YUV420', scale='stretch', stride=stride)
+    sent = numpy.frombuffer(bytes(spidev.SpiDev().writebytes2.call_args[0][0]), dtype='>u2').reshape(display.height, display.width)
+    assert (sent[:, :display.width // 2] == ST7735.ST7735_WHITE).all()
+    assert (sent[:, display.width // 2:] == ST7735.ST7735_BLACK).all()
+
+
+def test_display_yuv_memoryview(GPIO, spidev):
+    force_reimport('ST7735')
+    import ST7735
+    display = ST7735.ST7735(port=0, cs=0, dc=24)
+    display.display_yuv(memoryview(_yuv(320, 240, 235, 128, 128, 'NV12')), (320, 240), 'NV12')
+    sent = numpy.frombuffer(bytes(spidev.SpiDev().writebytes2.call_args[0][0]), dtype='>u2')
+    assert (sent == ST7735.ST7735_WHITE).all()